@@ -0,0 +1,63 @@
+import argparse
+import logging
+from pathlib import Path
+
+from database import Batch_Data
+
+
+def main(argv=None):
+    """
+    The main method of pyselector-batch runs the automatic selection on one or more data files without the gui. Several
+    files (or directories and glob patterns) are processed in parallel.
+    :param argv: list of command line arguments, defaults to sys.argv
+    """
+    parser = argparse.ArgumentParser(prog='pyselector-batch',
+                                     description='Select reaches of whole experiments without the gui')
+    parser.add_argument('data', nargs='+', help='data files, directories or glob patterns of the experiments')
+    parser.add_argument('setting', help='setting json file')
+    parser.add_argument('-o', '--output', default=None,
+                        help='output csv file of a single data file (default: <data>_selected.csv)')
+    parser.add_argument('-s', '--summary', default=None, help='csv file for the merged per trial summary')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='number of processes (default: all cores)')
+    parser.add_argument('-c', '--chunksize', type=int, default=None,
+                        help='stream the data files, processing about this many samples at a time')
+    parser.add_argument('-v', '--verbose', action='store_true', help='log every flagged trial')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format='%(asctime)s %(message)s')
+    setting = Path(args.setting)
+    data_addresses = Batch_Data.find_files(args.data)
+    if not data_addresses:
+        parser.error('no data files found')
+
+    if len(data_addresses) == 1:
+        summary = Batch_Data.run_batch(data_addresses[0], str(setting.parent), setting.stem, args.output,
+                                       args.chunksize)
+        summary.insert(0, 'file', data_addresses[0])
+        failures = {}
+    else:
+        if args.output:
+            parser.error('--output can only be used with a single data file')
+        summary, failures = Batch_Data.run_files(data_addresses, str(setting.parent), setting.stem, args.workers,
+                                                 progress=report_progress, chunksize=args.chunksize)
+
+    if args.summary:
+        summary.to_csv(args.summary, index=False)
+
+    flagged = summary[summary.flagged == 1]
+    print('{} trials selected, {} flagged for review'.format(len(summary) - len(flagged), len(flagged)))
+    for file, trials in flagged.groupby('file').trial_no:
+        print('{}: flagged trials {}'.format(file, ', '.join(str(trial) for trial in trials)))
+    for file, error in failures.items():
+        print('{}: FAILED ({})'.format(file, error))
+
+
+def report_progress(done, total, data_address, error):
+    """
+    The report_progress method prints one line for every finished data file
+    """
+    print('[{}/{}] {} {}'.format(done, total, data_address, 'done' if error is None else 'FAILED'))
+
+
+if __name__ == "__main__":
+    main()
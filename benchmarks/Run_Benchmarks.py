@@ -0,0 +1,187 @@
+import argparse
+import datetime
+import glob
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import matplotlib
+matplotlib.use('Agg')  # the benchmarks draw without a display
+import numpy as np
+import pandas as pd
+from matplotlib import pyplot as plt
+
+from benchmarks.Synthetic_Data import default_setting, write_session
+from database.Journal_Data import compact_journal
+from database.Plot_Data import reachprofile, velocityprofile
+from database.Read_Data import load_setting, read_arguments, set_data, set_experiment, trial_frame, unify_data
+
+TEST_DATA = Path(__file__).resolve().parent.parent / 'Test_Data'
+
+
+def measure(function, repeat=3):
+    """
+    The measure method times a function and measures the peak of the memory it allocates. The time is measured without
+    tracemalloc, which slows python down, and the memory in one more run with it.
+    :param function: a callable without arguments
+    :param repeat: number of timed runs
+    :return: A dictionary with the best and mean time in seconds and the peak memory in bytes
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'seconds_min': min(times), 'seconds_mean': sum(times) / len(times), 'peak_memory_bytes': peak}
+
+
+def benchmark_session(name, data_address, setting_locator, setting_name, ntrials=20, repeat=3):
+    """
+    The benchmark_session method runs the benchmarks of one data file: set_data without and with the cache,
+    set_experiment, velocityprofile and reachprofile (which needs the selection of velocityprofile) of ntrials trials,
+    and writing the output (what outputdata does)
+    :param name: the name of the data set in the results
+    :param data_address: A string identifying the location of data
+    :param setting_locator: A string identifying the setting folder
+    :param setting_name: A string identifying the setting name
+    :param ntrials: number of trials profiled by velocityprofile and reachprofile
+    :param repeat: number of timed runs of every benchmark
+    :return: A list of result dictionaries, with an error instead of the measures when a benchmark fails
+    """
+    cache_dir = tempfile.mkdtemp(prefix='pyselector_bench_')
+    try:
+        experiment, setting = set_data(data_address, setting_locator, setting_name, cache_dir=cache_dir)
+    except Exception as error:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        return [{'benchmark': 'set_data', 'data': name, 'error': '{}: {}'.format(type(error).__name__, error)}]
+    trials = experiment['trials'][:ntrials]
+
+    def read_unified():
+        read_setting = load_setting(setting_locator, setting_name)
+        data = pd.read_csv(data_address, **read_arguments(data_address, read_setting))
+        return (data if 'selected' in data_address else unify_data(data, read_setting)), read_setting
+
+    unified, unified_setting = read_unified()
+
+    def profile_trials(profile):
+        for trial in trials:
+            profile(trial_frame(experiment, trial))
+            plt.close('all')
+
+    output_address = os.path.join(cache_dir, 'output_selected.csv')
+    cases = [
+        ('set_data', lambda: set_data(data_address, setting_locator, setting_name, use_cache=False)),
+        ('set_data_cached', lambda: set_data(data_address, setting_locator, setting_name, cache_dir=cache_dir)),
+        ('set_experiment', lambda: set_experiment(unified.copy(), unified_setting)),
+        ('velocityprofile', lambda: profile_trials(lambda data: velocityprofile(data, setting))),
+        ('reachprofile', lambda: profile_trials(lambda data: (velocityprofile(data, setting),
+                                                              reachprofile(data, setting, experiment['all_targets'])))),
+        ('outputdata', lambda: compact_journal(experiment, output_address)),
+    ]
+
+    results = []
+    try:
+        for case, function in cases:
+            result = {'benchmark': case, 'data': name, 'samples': int(len(unified)),
+                      'trials': int(len(experiment['trials'])),
+                      'profiled_trials': int(len(trials)) if case.endswith('profile') else None}
+            try:
+                result.update(measure(function, repeat))
+            except Exception as error:
+                result['error'] = '{}: {}'.format(type(error).__name__, error)
+            results.append(result)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return results
+
+
+def bundled_sessions(folder, setting_folder):
+    """
+    The bundled_sessions method lists the data files of Test_Data with the setting they are read with. They are
+    output files of Pyselector, which are read with the column names of their own header line.
+    :param folder: A string identifying the Test_Data folder
+    :param setting_folder: A string identifying a folder for the setting file
+    :return: A list of (name, data address, setting folder, setting name)
+    """
+    with open(os.path.join(setting_folder, 'test_data.json'), 'w') as fp:
+        json.dump(default_setting(), fp)
+    return [(os.path.basename(address), address, setting_folder, 'test_data')
+            for address in sorted(glob.glob(os.path.join(str(folder), '*'))) if os.path.isfile(address)
+            and not os.path.basename(address).startswith('.')]
+
+
+def run(sizes=(100, 1000), rate=100, duration=2.0, ntrials=20, repeat=3, test_data=True):
+    """
+    The run method runs the benchmarks on synthetic sessions of the given sizes and on the files of Test_Data
+    :param sizes: numbers of trials of the synthetic sessions
+    :param rate: number of samples per second of the synthetic sessions
+    :param duration: length of every synthetic trial in seconds
+    :param ntrials: number of trials profiled by velocityprofile and reachprofile
+    :param repeat: number of timed runs of every benchmark
+    :param test_data: False to skip Test_Data
+    :return: A json serializable dictionary describing the environment and holding the results
+    """
+    folder = tempfile.mkdtemp(prefix='pyselector_sessions_')
+    results = []
+    try:
+        sessions = [('synthetic_{}x{}Hz'.format(size, rate),) +
+                    write_session(folder, 'session{}'.format(size), ntrials=size, rate=rate, duration=duration)
+                    for size in sizes]
+        if test_data and TEST_DATA.is_dir():
+            sessions += bundled_sessions(TEST_DATA, folder)
+        for name, data_address, setting_locator, setting_name in sessions:
+            results += benchmark_session(name, data_address, setting_locator, setting_name, ntrials, repeat)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    return {'date': datetime.datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'matplotlib': matplotlib.__version__,
+            'parameters': {'sizes': list(sizes), 'rate': rate, 'duration': duration, 'profiled_trials': ntrials,
+                           'repeat': repeat},
+            'results': results}
+
+
+def main(argv=None):
+    """
+    The main method runs the benchmarks from the command line and writes the results as json
+    :param argv: list of command line arguments, defaults to sys.argv
+    """
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='Time the loading, selection, plotting and saving of sessions')
+    parser.add_argument('-o', '--output', default=None, help='json file for the results (default: print them)')
+    parser.add_argument('-s', '--sizes', type=int, nargs='+', default=[100, 1000],
+                        help='numbers of trials of the synthetic sessions')
+    parser.add_argument('-r', '--rate', type=float, default=100, help='samples per second of the synthetic sessions')
+    parser.add_argument('-d', '--duration', type=float, default=2.0, help='seconds per synthetic trial')
+    parser.add_argument('-t', '--trials', type=int, default=20, help='trials profiled by the plot benchmarks')
+    parser.add_argument('-n', '--repeat', type=int, default=3, help='timed runs of every benchmark')
+    parser.add_argument('--no-test-data', action='store_true', help='skip the files of Test_Data')
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.rate, args.duration, args.trials, args.repeat, not args.no_test_data)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(report, fp, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+    for result in report['results']:
+        sys.stderr.write('{data:<40} {benchmark:<16} {0}\n'.format(
+            result.get('error') or '{:.4f} s {:.1f} MB'.format(result['seconds_min'],
+                                                                 result['peak_memory_bytes'] / 1e6), **result))
@@ -0,0 +1,119 @@
+import collections
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from database.Read_Data import TIME_SCALES, POSITION_SCALES
+
+# The home position and the distance of the targets of the synthetic sessions, in cm, as in Test_Data
+HOME = (0.0, -8.5)
+TARGET_DISTANCE = 12.0
+TARGET_ANGLES = (45.0, 80.0, 100.0, 135.0)
+HAND_PREFIXES = ('hand', 'pen', 'robot', 'mouse')
+
+
+def default_setting(header=0, position_unit='cm', px_cm_ratio=0.0271):
+    """
+    The default_setting method makes the setting dictionary of a synthetic session, as saved by the setting window
+    :param header: 0 when the data file has its own header line, or the list of column names
+    :param position_unit: the unit of the position columns. For 'px' the display origin and ratio are set
+    :param px_cm_ratio: the number of cm of one pixel, for 'px'
+    :return: A setting dictionary
+    """
+    setting = {'Display Origin': ['', '', ''], 'Display Scale': ['', '', ''], 'Filter': False,
+               'Header': header if header == 0 else str(list(header)), 'Name': '', 'PX_CM_Ratio': '',
+               'Real Origin': ['', '', ''], 'Real Scale': ['', '', ''], 'Segments': ['', '', ''], 'Use_Pixels': '',
+               'return_units': 'CM'}
+    if position_unit == 'px':
+        setting['Display Origin'] = [528, 395, 'px']
+        setting['PX_CM_Ratio'] = str(px_cm_ratio)
+    return setting
+
+
+def make_session(ntrials=100, rate=100, duration=2.0, time_unit='ms', position_unit='cm', hand='hand', seed=0,
+                 px_cm_ratio=0.0271):
+    """
+    The make_session method generates a reach session: every trial holds still at home, reaches a target on a
+    minimum jerk path after a random reaction time and holds still at the target, with a little noise. The cursor
+    follows the hand rotated by the rotation of the trial. The columns are named <name>_<unit> as unify_data expects.
+    :param ntrials: number of trials
+    :param rate: number of samples per second
+    :param duration: length of every trial in seconds
+    :param time_unit: a unit of Read_Data.TIME_SCALES
+    :param position_unit: a unit of Read_Data.POSITION_SCALES
+    :param hand: the name of the hand columns, one of HAND_PREFIXES
+    :param seed: seed of the random numbers
+    :param px_cm_ratio: the number of cm of one pixel, for 'px'
+    :return: A pandas dataframe in the layout of a raw data file
+    """
+    if time_unit not in TIME_SCALES or position_unit not in POSITION_SCALES or hand not in HAND_PREFIXES:
+        raise ValueError('unknown unit or hand column')
+    random = np.random.RandomState(seed)
+    nsamples = int(rate * duration)
+    time_ms = np.arange(nsamples) * 1000.0 / rate
+
+    target_angle = np.array(TARGET_ANGLES)[np.arange(ntrials) % len(TARGET_ANGLES)]
+    rotation = np.where(np.arange(ntrials) >= ntrials // 2, 30.0, 0.0)
+    target = np.stack([HOME[0] + TARGET_DISTANCE * np.cos(np.radians(target_angle)),
+                       HOME[1] + TARGET_DISTANCE * np.sin(np.radians(target_angle))], axis=1)
+
+    # minimum jerk reaches, one row per trial
+    onset = random.uniform(0.2, 0.4, ntrials) * 1000
+    movement_time = random.uniform(0.4, 0.7, ntrials) * 1000
+    tau = np.clip((time_ms[None, :] - onset[:, None]) / movement_time[:, None], 0, 1)
+    shape = 10 * tau ** 3 - 15 * tau ** 4 + 6 * tau ** 5
+    handx = HOME[0] + (target[:, 0, None] - HOME[0]) * shape + random.normal(0, 0.01, shape.shape)
+    handy = HOME[1] + (target[:, 1, None] - HOME[1]) * shape + random.normal(0, 0.01, shape.shape)
+    angle = np.radians(rotation)[:, None]
+    cursorx = HOME[0] + np.cos(angle) * (handx - HOME[0]) - np.sin(angle) * (handy - HOME[1])
+    cursory = HOME[1] + np.sin(angle) * (handx - HOME[0]) + np.cos(angle) * (handy - HOME[1])
+
+    def position(values, origin):
+        if position_unit == 'px':
+            return values.ravel() / px_cm_ratio + origin
+        return values.ravel() / POSITION_SCALES[position_unit]
+
+    def repeat(values):
+        return np.repeat(values, nsamples)
+
+    origin = default_setting(position_unit='px')['Display Origin']
+    unit = '_' + position_unit
+    return pd.DataFrame(collections.OrderedDict([
+        ('task', repeat(np.ones(ntrials))),
+        ('block', repeat(np.arange(ntrials) // 50 + 1.0)),
+        ('trial_no', repeat(np.arange(1, ntrials + 1, dtype=float))),
+        ('targetangle_deg', repeat(target_angle)),
+        ('rotation_deg', repeat(rotation)),
+        ('time_' + time_unit, np.tile(time_ms, ntrials) / TIME_SCALES[time_unit]),
+        ('cursorx' + unit, position(cursorx, origin[0])),
+        ('cursory' + unit, position(cursory, origin[1])),
+        (hand + 'x' + unit, position(handx, origin[0])),
+        (hand + 'y' + unit, position(handy, origin[1])),
+        ('targetx' + unit, position(np.repeat(target[:, 0], nsamples), origin[0])),
+        ('targety' + unit, position(np.repeat(target[:, 1], nsamples), origin[1])),
+        ('step', np.tile(np.where(time_ms < 100, 0, np.where(time_ms < duration * 900, 1, 2)), ntrials)),
+    ]))
+
+
+def write_session(folder, name='synthetic', header_line=True, **kwargs):
+    """
+    The write_session method writes a synthetic session as a tab separated data file and its setting file
+    :param folder: A string identifying the folder the files are written to
+    :param name: the name of the data file and the setting file
+    :param header_line: True to write the column names in the data file, False to give them in the setting Header
+    :param kwargs: the arguments of make_session
+    :return: the data address, the setting folder and the setting name, as set_data takes them
+    """
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    session = make_session(**kwargs)
+    data_address = folder / (name + '.txt')
+    session.to_csv(data_address, sep='\t', index=False, header=header_line)
+
+    setting = default_setting(0 if header_line else list(session.columns), kwargs.get('position_unit', 'cm'),
+                              kwargs.get('px_cm_ratio', 0.0271))
+    with open(folder / (name + '.json'), 'w') as fp:
+        json.dump(setting, fp)
+    return str(data_address), str(folder), name
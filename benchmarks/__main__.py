@@ -0,0 +1,4 @@
+from benchmarks.Run_Benchmarks import main
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+import glob
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from database.Read_Data import set_data, load_setting, iter_experiments, trial_order, trial_values, column_values, \
+    set_values, write_output, output_path
+from database.Metrics_Data import metrics_path, write_metrics
+from database.Score_Data import score_trials
+from database.Select_Data import session_profile
+
+
+def run_batch(data_address, setting_locator, setting_name, output_address=None, chunksize=None):
+    """
+    The run_batch method loads an experiment, runs the automatic selection on all of its trials and writes the
+    selected output csv file and its metrics table (see trial_metrics). It does not use wx or matplotlib, so it can run
+    without a display.
+    :param data_address: A string identifying the location of data
+    :param setting_locator: A string identifying the setting folder
+    :param setting_name: A string identifying the setting name
+    :param output_address: A string identifying the output csv file. Defaults to the _selected.csv file next to the data
+    :param chunksize: When given, the file is streamed with iter_trials and processed about chunksize samples at a
+    time, so that memory use does not depend on the size of the file
+    :return: The summary dataframe returned by select_experiment
+    """
+    if output_address is None:
+        output_address = output_path(data_address)
+    if chunksize:
+        summary = run_stream(data_address, setting_locator, setting_name, output_address, chunksize)
+    else:
+        experiment, setting = set_data(data_address, setting_locator, setting_name)
+        summary = select_experiment(experiment, setting)
+        write_output(experiment, output_address)
+        write_metrics(experiment, metrics_path(output_address))
+    logging.info('%s: %d trials selected, %d flagged, written to %s', data_address, len(summary),
+                 summary.flagged.sum(), output_address)
+    return summary
+
+
+def run_stream(data_address, setting_locator, setting_name, output_address, chunksize):
+    """
+    The run_stream method is the streaming version of run_batch. The experiments of about chunksize samples yielded by
+    iter_experiments are selected one at a time and appended to the output csv file and its metrics table.
+    :param data_address: A string identifying the location of data
+    :param setting_locator: A string identifying the setting folder
+    :param setting_name: A string identifying the setting name
+    :param output_address: A string identifying the output csv file
+    :param chunksize: number of samples processed at a time
+    :return: The summary dataframe of all trials
+    """
+    setting = load_setting(setting_locator, setting_name)
+    summaries = []
+    for idx, experiment in enumerate(iter_experiments(data_address, setting, chunksize)):
+        summaries.append(select_experiment(experiment, setting))
+        write_output(experiment, output_address, append=idx > 0)
+        write_metrics(experiment, metrics_path(output_address), append=idx > 0)
+
+    return pd.concat(summaries, ignore_index=True)
+
+
+def run_files(data_addresses, setting_locator, setting_name, max_workers=None, progress=None, chunksize=None):
+    """
+    The run_files method runs run_batch on many data files in parallel, one process per file. A file that fails does
+    not stop the others; its error is reported instead.
+    :param data_addresses: A list of strings identifying the data files
+    :param setting_locator: A string identifying the setting folder
+    :param setting_name: A string identifying the setting name
+    :param max_workers: Number of processes to use, defaults to the number of cores
+    :param progress: Optional callable taking (files done, number of files, data address, error or None), called as
+    every file finishes
+    :param chunksize: Streams every file, see run_batch
+    :return: A merged summary dataframe of all files with a file column, and a dictionary of data address to error
+    message for the files that failed
+    """
+    summaries = []
+    failures = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_run_file, data_address, setting_locator, setting_name, chunksize): data_address
+                   for data_address in data_addresses}
+        for done, future in enumerate(as_completed(futures), 1):
+            data_address = futures[future]
+            try:
+                summary, error = future.result()
+            except Exception as err:  # the worker process itself died
+                summary, error = None, repr(err)
+            if error is None:
+                summary.insert(0, 'file', data_address)
+                summaries.append(summary)
+            else:
+                failures[data_address] = error
+                logging.warning('%s failed: %s', data_address, error)
+            if progress is not None:
+                progress(done, len(futures), data_address, error)
+
+    if summaries:
+        merged = pd.concat(summaries, ignore_index=True)
+    else:
+        merged = pd.DataFrame(columns=['file', 'trial_no', 'p1', 'p2', 'max_velocity', 'peak_speed', 'confidence',
+                                       'flagged'])
+    return merged, failures
+
+
+def _run_file(data_address, setting_locator, setting_name, chunksize):
+    """
+    The _run_file method is the worker of run_files. It catches every error so that one bad file is reported
+    instead of breaking the pool.
+    :return: The summary dataframe and None, or None and the error message
+    """
+    try:
+        return run_batch(data_address, setting_locator, setting_name, chunksize=chunksize), None
+    except Exception as err:
+        return None, '{}: {}'.format(type(err).__name__, err)
+
+
+def find_files(locations):
+    """
+    The find_files method expands directories and glob patterns into the list of data files to process. Hidden files
+    and the selected output and metrics files written for other data files in the list are skipped.
+    :param locations: A list of strings identifying data files, directories or glob patterns
+    :return: A sorted list of data file addresses
+    """
+    files = []
+    for location in locations:
+        if os.path.isdir(location):
+            files += [os.path.join(location, name) for name in os.listdir(location) if not name.startswith('.')]
+        else:
+            files += glob.glob(location)
+    files = sorted(set(file for file in files if os.path.isfile(file)))
+    outputs = set(output_path(file) for file in files) | set(metrics_path(output_path(file)) for file in files)
+    return [file for file in files if os.path.abspath(file) not in outputs]
+
+
+def select_experiment(experiment, setting=None):
+    """
+    The select_experiment method runs the automatic p1, p2 and max velocity selection on every trial of an experiment
+    that has not been accepted or rejected yet, using the batched session_profile. Trials that are selected are marked
+    as accepted, trials where the selection fails are left unselected and marked as unsure, and so are the selected
+    trials that score_trials flags, so that jumptotrial in the gui only visits those. The scores are kept in
+    experiment['scores'].
+    :param experiment: An experiment configuration dictionary as returned by set_data
+    :param setting: Setting dictionary, for its 'Resampling', 'Detection' and 'Scoring' blocks
+    :return: A pandas dataframe with one row per processed trial holding p1, p2, max velocity, the confidence and a
+    flagged column
+    """
+    profile = session_profile(experiment, setting)
+    experiment['scores'] = score_trials(experiment, setting, profile)
+    order, lengths = trial_order(experiment)
+    time_ms = column_values(experiment, 'time_ms')[order]
+
+    undecided = ~np.in1d(trial_values(experiment, 'accept'), [1, -1])
+    valid = profile['valid'] & (profile['peak_speed'] > 0) & (profile['p2'] > profile['p1'])
+    selected = undecided & valid
+    flagged = undecided & (~valid | experiment['scores']['flagged'].values)
+    for trial in experiment['trials'][flagged]:
+        logging.info('trial %s flagged', trial)
+
+    p1, p2 = [np.repeat(profile[key], lengths) for key in ['p1', 'p2']]
+    selected_samples = np.repeat(selected, lengths)
+    max_samples = profile['max_sample'][selected]
+
+    set_values(experiment, 'selected', order[selected_samples], 0)
+    set_values(experiment, 'selected', order[selected_samples & (time_ms >= p1) & (time_ms <= p2)], 1)
+    set_values(experiment, 'max_velocity', order[max_samples], 1)
+    set_values(experiment, 'accept', order[selected_samples], 1)
+    set_values(experiment, 'unsure', order[np.repeat(flagged, lengths)], 1)
+
+    return pd.DataFrame({'trial_no': experiment['trials'][undecided],
+                         'p1': profile['p1'][undecided],
+                         'p2': profile['p2'][undecided],
+                         'max_velocity': profile['max_velocity'][undecided],
+                         'peak_speed': profile['peak_speed'][undecided],
+                         'confidence': experiment['scores']['confidence'].values[undecided],
+                         'flagged': flagged[undecided].astype(int)},
+                        columns=['trial_no', 'p1', 'p2', 'max_velocity', 'peak_speed', 'confidence', 'flagged'])
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+# Bump this when the layout of the unified data changes, so that old cache files are no longer used
+CACHE_VERSION = '2'
+CACHE_FOLDER = '.pyselector_cache'
+
+
+def cache_key(data_address, setting):
+    """
+    The cache_key method creates the key of a cached experiment from the content of the data file and the setting it
+    is loaded with, so that changes to either of them are never served from the cache
+    :param data_address: A string identifying the location of data
+    :param setting: Setting dictionary as read from file, before set_data changes it
+    :return: A hexadecimal string
+    """
+    digest = hashlib.sha1(CACHE_VERSION.encode())
+    digest.update(json.dumps(setting, sort_keys=True).encode())
+    with open(data_address, 'rb') as fp:
+        for block in iter(lambda: fp.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_path(data_address, key, cache_dir=None):
+    """
+    The cache_path method creates the location of the cache file of an experiment
+    :param data_address: A string identifying the location of data
+    :param key: A string as returned by cache_key
+    :param cache_dir: A string identifying the cache folder. Defaults to a hidden folder next to the data
+    :return: A string identifying the cache file
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.abspath(os.path.join(data_address, os.pardir)), CACHE_FOLDER)
+    return os.path.join(cache_dir, os.path.basename(data_address) + '-' + key[:20] + '.npz')
+
+
+def memmap_path(data_address, key, cache_dir=None):
+    """
+    The memmap_path method creates the location of the memmapped layout of an experiment, see Memmap_Data
+    :param data_address: A string identifying the location of data
+    :param key: A string as returned by cache_key
+    :param cache_dir: A string identifying the cache folder. Defaults to a hidden folder next to the data
+    :return: A string identifying the layout folder
+    """
+    folder = os.path.dirname(cache_path(data_address, key, cache_dir))
+    return os.path.join(folder, os.path.basename(data_address) + '.memmap-' + key[:20])
+
+
+def load_cache(path):
+    """
+    The load_cache method reads a cached experiment
+    :param path: A string identifying the cache file
+    :return: The unified dataframe, the setting dictionary and the trial numbers, row positions grouped by trial and
+    number of samples per trial of the trial index (see build_index), or None if there is no cache file
+    """
+    if not os.path.isfile(path):
+        return None
+    with np.load(path, allow_pickle=False) as cache:
+        columns = list(cache['columns'])
+        data = pd.DataFrame(column_arrays(cache, columns), columns=columns, index=cache['index'])
+        setting = json.loads(str(cache['setting']))
+        trials, order, lengths = cache['trials'], cache['order'], cache['lengths']
+    logging.info('loaded %s from cache', path)
+    return data, setting, trials, order, lengths
+
+
+def store_cache(path, data, setting, trial_index):
+    """
+    The store_cache method writes an experiment to its cache file in a binary columnar format (one numpy array per
+    column). Older cache files of the same data file are removed. Failing to write the cache is logged and ignored.
+    :param path: A string identifying the cache file
+    :param data: The unified dataframe
+    :param setting: The setting dictionary as changed by set_data
+    :param trial_index: The trial index as returned by index_trials
+    """
+    rows = [np.arange(rows.start, rows.stop) if isinstance(rows, slice) else rows for rows in trial_index.values()]
+    arrays = {'column' + str(idx): column_array(data[column]) for idx, column in enumerate(data.columns)}
+    try:
+        folder, name = os.path.split(path)
+        os.makedirs(folder, exist_ok=True)
+        prefix = name.rsplit('-', 1)[0] + '-'
+        for old in os.listdir(folder):
+            if old.startswith(prefix) and old != name:
+                os.remove(os.path.join(folder, old))
+        with open(path + '.tmp', 'wb') as fp:
+            np.savez(fp, columns=np.array(list(data.columns), dtype=str), index=data.index.values,
+                     setting=np.array(json.dumps(setting)), trials=np.array(list(trial_index.keys())),
+                     order=np.concatenate(rows), lengths=np.array([len(trial_rows) for trial_rows in rows]),
+                     **arrays)
+        os.replace(path + '.tmp', path)
+    except OSError as err:
+        logging.warning('could not write cache %s: %s', path, err)
+
+
+def column_array(column):
+    """
+    The column_array method converts a dataframe column to an array that can be stored without pickling
+    :param column: A pandas series
+    :return: A numpy array, object columns are stored as strings
+    """
+    if column.dtype == object:
+        return column.values.astype(str)
+    return column.values
+
+
+def column_arrays(cache, columns):
+    """
+    The column_arrays method reads the column arrays of a cache file into a dictionary for the dataframe constructor
+    :param cache: An open npz file
+    :param columns: list of column names in the order they were stored
+    :return: A dictionary of column name to numpy array
+    """
+    return {column: cache['column' + str(idx)] for idx, column in enumerate(columns)}
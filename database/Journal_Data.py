@@ -0,0 +1,210 @@
+import collections
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+from database.Read_Data import store_trial, trial_frame, trial_values, write_output
+from database.Select_Data import mark_selection
+
+JOURNAL_SUFFIX = '.journal'
+AUTOSAVE_DELAY = 2.0  # seconds without a new decision before the journal is written
+
+
+def journal_path(output_address):
+    """
+    The journal_path method returns the location of the decisions journal of an output file
+    :param output_address: A string identifying the output csv file
+    :return: A string identifying the journal file, next to the output file
+    """
+    return output_address + JOURNAL_SUFFIX
+
+
+def decision(trial, trial_data):
+    """
+    The decision method makes the journal record of a reviewed trial
+    :param trial: the trial number (NOT INDEX)
+    :param trial_data: Pandas dataframe for one trial with accept, unsure, selectedp1, selectedp2 and
+    selectedmaxvelocity set
+    :return: A dictionary of json serializable values
+    """
+    return {'trial': float(trial),
+            'accept': int(np.asarray(trial_data.accept)[0]),
+            'unsure': int(np.asarray(trial_data.unsure)[0]),
+            'p1': float(trial_data.selectedp1),
+            'p2': float(trial_data.selectedp2),
+            'max_velocity': float(trial_data.selectedmaxvelocity)}
+
+
+def append_decisions(journal_address, records):
+    """
+    The append_decisions method appends records to the journal and syncs it to disk, so that they survive a crash.
+    Only the new lines are written, however large the experiment.
+    :param journal_address: A string identifying the journal file
+    :param records: A list of dictionaries as returned by decision
+    """
+    with open(journal_address, 'a') as fp:
+        fp.write(''.join(json.dumps(record) + '\n' for record in records))
+        fp.flush()
+        os.fsync(fp.fileno())
+
+
+def write_journal(journal_address, records):
+    """
+    The write_journal method replaces the journal with the given records. It writes a temporary file and renames it,
+    so that a crash leaves either the old or the new journal.
+    :param journal_address: A string identifying the journal file
+    :param records: A list of dictionaries as returned by decision
+    """
+    temporary = journal_address + '.tmp'
+    with open(temporary, 'w') as fp:
+        fp.write(''.join(json.dumps(record) + '\n' for record in records))
+        fp.flush()
+        os.fsync(fp.fileno())
+    os.replace(temporary, journal_address)
+
+
+def read_journal(journal_address):
+    """
+    The read_journal method reads the decisions of a journal. A trial decided more than once keeps its last decision
+    and a line cut short by a crash is skipped.
+    :param journal_address: A string identifying the journal file
+    :return: An ordered dictionary from trial number to record, empty when there is no journal
+    """
+    decisions = collections.OrderedDict()
+    if not os.path.isfile(journal_address):
+        return decisions
+    with open(journal_address, 'r') as fp:
+        for line in fp:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logging.warning('skipping a broken line of %s', journal_address)
+                continue
+            decisions.pop(record['trial'], None)
+            decisions[record['trial']] = record
+    return decisions
+
+
+def replay_journal(experiment, journal_address):
+    """
+    The replay_journal method applies the decisions of a journal to an experiment, the same way the GUI stores them,
+    to recover the decisions made since the output file was last written
+    :param experiment: An experiment configuration dictionary as returned by set_data
+    :param journal_address: A string identifying the journal file
+    :return: The number of trials replayed
+    """
+    replayed = 0
+    for trial, record in read_journal(journal_address).items():
+        if trial not in experiment['trial_index']:
+            continue
+        trial_data = trial_frame(experiment, trial)
+        trial_data['accept'] = record['accept']
+        trial_data['unsure'] = record['unsure']
+        object.__setattr__(trial_data, 'selectedp1', record['p1'])
+        object.__setattr__(trial_data, 'selectedp2', record['p2'])
+        object.__setattr__(trial_data, 'selectedmaxvelocity', record['max_velocity'])
+        mark_selection(trial_data)
+        store_trial(experiment, trial, trial_data)
+        replayed += 1
+    return replayed
+
+
+def resume_index(experiment):
+    """
+    The resume_index method finds where the review of an experiment stopped
+    :param experiment: An experiment configuration dictionary as returned by set_data
+    :return: The index of the first trial neither accepted nor rejected, 0 when every trial is reviewed
+    """
+    unreviewed = np.flatnonzero(trial_values(experiment, 'accept') == 0)
+    return int(unreviewed[0]) if unreviewed.size else 0
+
+
+class Autosaver:
+    """
+    Autosaver writes the decisions of a review to its journal in a background thread, once no decision was made for
+    AUTOSAVE_DELAY seconds, so that saving never blocks the GUI. The decisions are appended, and once the journal holds
+    more superseded lines than current ones it is rewritten with one line per trial (see write_journal).
+    """
+    def __init__(self, journal_address, delay=AUTOSAVE_DELAY):
+        """
+        The constructor reads the decisions already in the journal
+        :param journal_address: A string identifying the journal file
+        :param delay: seconds without a new decision before the journal is written
+        """
+        self.journal_address = journal_address
+        self.delay = delay
+        self.decisions = read_journal(journal_address)
+        self.lines = 0
+        if os.path.isfile(journal_address):
+            with open(journal_address, 'r') as fp:
+                self.lines = sum(1 for line in fp)
+        self.pending = []
+        self.lock = threading.Lock()
+        self.timer = None
+
+    def record(self, record):
+        """
+        The record method queues a decision and restarts the timer of the autosave
+        :param record: A dictionary as returned by decision
+        """
+        with self.lock:
+            self.pending.append(record)
+            self.decisions.pop(record['trial'], None)
+            self.decisions[record['trial']] = record
+            if self.timer is not None:
+                self.timer.cancel()
+            self.timer = threading.Timer(self.delay, self.save)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def save(self):
+        """
+        The save method writes the queued decisions to the journal. It runs in the timer thread.
+        """
+        with self.lock:
+            if not self.pending:
+                return
+            if self.lines + len(self.pending) > 2 * len(self.decisions):
+                write_journal(self.journal_address, list(self.decisions.values()))
+                self.lines = len(self.decisions)
+            else:
+                append_decisions(self.journal_address, self.pending)
+                self.lines += len(self.pending)
+            self.pending = []
+
+    def flush(self):
+        """
+        The flush method writes the queued decisions right away, for when the review is saved or closed
+        """
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        self.save()
+
+    def clear(self):
+        """
+        The clear method forgets all decisions, for when compact_journal made them part of the output file
+        """
+        with self.lock:
+            self.decisions.clear()
+            self.pending = []
+            self.lines = 0
+
+
+def compact_journal(experiment, output_address):
+    """
+    The compact_journal method writes the full output file of an experiment and removes its journal, whose decisions
+    are then part of the output file. The output file is written to a temporary file first and moved in place, so a
+    crash never leaves a half written output file.
+    :param experiment: An experiment configuration dictionary as returned by set_data
+    :param output_address: A string identifying the output csv file
+    """
+    temporary = output_address + '.tmp'
+    write_output(experiment, temporary)
+    os.replace(temporary, output_address)
+    if os.path.isfile(journal_path(output_address)):
+        os.remove(journal_path(output_address))
@@ -0,0 +1,110 @@
+import collections
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+LAYOUT_FILE = 'layout.json'
+
+
+def write_memmap(frames, directory, setting):
+    """
+    The write_memmap method writes experiment data to an on-disk layout: one raw binary file per column, read back as a
+    numpy memmap, and a layout file holding the dtypes, the trial offset table and the targets. The frames are
+    appended one after the other, so the data never needs to be in memory at once. Only numeric columns can be stored,
+    so data with other columns raises a ValueError rather than being written without them.
+    :param frames: An iterable of experiment dataframes holding whole trials, with the samples of every trial stored
+    one after the other
+    :param directory: A string identifying the folder of the layout
+    :param setting: The setting dictionary the data was loaded with
+    """
+    os.makedirs(directory, exist_ok=True)
+    if os.path.isfile(os.path.join(directory, LAYOUT_FILE)):
+        os.remove(os.path.join(directory, LAYOUT_FILE))
+
+    columns, files = None, {}
+    trials, lengths, targets = [], [], set()
+    try:
+        for frame in frames:
+            if columns is None:
+                columns = [(column, np.asarray(frame[column]).dtype) for column in frame.columns]
+                others = [column for column, dtype in columns
+                          if not (np.issubdtype(dtype, np.number) or np.issubdtype(dtype, np.bool_))]
+                if others:
+                    raise ValueError('The Memmap setting only stores numeric columns, turn it off for data with the '
+                                     'columns ' + ', '.join(others))
+                columns = [(column, dtype.str) for column, dtype in columns]
+                files = {column: open(os.path.join(directory, column + '.bin'), 'wb') for column, dtype in columns}
+            for column, dtype in columns:
+                np.asarray(frame[column], dtype=dtype).tofile(files[column])
+            for trial, group in frame.groupby('trial_no', sort=False, observed=True):
+                trials.append(float(trial))
+                lengths.append(len(group))
+            targets.update(zip(np.asarray(frame.targetx_cm, dtype=float), np.asarray(frame.targety_cm, dtype=float)))
+    finally:
+        for fp in files.values():
+            fp.close()
+
+    layout = {'columns': columns or [], 'trials': trials, 'lengths': lengths,
+              'all_targets': sorted(targets), 'setting': setting}
+    # the layout file is written last, so a layout is only used once it is complete
+    with open(os.path.join(directory, LAYOUT_FILE), 'w') as fp:
+        json.dump(layout, fp)
+
+
+def has_layout(directory):
+    """
+    The has_layout method checks if a complete layout exists in a folder
+    :param directory: A string identifying the folder of the layout
+    :return: A boolean
+    """
+    return os.path.isfile(os.path.join(directory, LAYOUT_FILE))
+
+
+def open_memmap(directory):
+    """
+    The open_memmap method opens a layout written by write_memmap as an experiment configuration dictionary. Instead
+    of an 'output' dataframe it holds a 'columns' dictionary of numpy memmaps, so that trial_frame and store_trial only
+    touch the samples of one trial and the operating system pages data in and out as needed. The memmaps are copy on
+    write: the layout is a cache of the data file, so the decisions stored in the experiment are only kept in memory
+    and saved with the output file and the journal, never in the layout.
+    :param directory: A string identifying the folder of the layout
+    :return: An experiment configuration dictionary as returned by set_experiment, and the setting dictionary
+    """
+    with open(os.path.join(directory, LAYOUT_FILE), 'r') as fp:
+        layout = json.load(fp)
+
+    lengths = np.array(layout['lengths'], dtype=int)
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    columns = collections.OrderedDict()
+    for column, dtype in layout['columns']:
+        path = os.path.join(directory, column + '.bin')
+        if ends.size and ends[-1]:
+            columns[column] = np.memmap(path, dtype=np.dtype(dtype), mode='c', shape=(int(ends[-1]),))
+        else:
+            columns[column] = np.zeros(0, dtype=np.dtype(dtype))
+
+    cfg = {}
+    cfg['Trial'] = {}
+    cfg['all_targets'] = np.array(layout['all_targets'])
+    cfg['output'] = None
+    cfg['columns'] = columns
+    cfg['trial_index'] = collections.OrderedDict(
+        (trial, slice(int(start), int(end))) for trial, start, end in zip(layout['trials'], starts, ends))
+    cfg['trials'] = np.array(layout['trials'])
+    cfg['trial_starts'] = starts
+    return cfg, layout['setting']
+
+
+def memmap_frame(columns, rows):
+    """
+    The memmap_frame method copies some rows of a memmapped experiment into a dataframe
+    :param columns: The 'columns' dictionary of the experiment
+    :param rows: A slice or numpy array of row positions
+    :return: A pandas dataframe indexed by row position
+    """
+    index = np.arange(rows.start, rows.stop) if isinstance(rows, slice) else rows
+    return pd.DataFrame(collections.OrderedDict((column, np.array(values[rows])) for column, values in columns.items()),
+                        index=index)
@@ -0,0 +1,102 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from database.Read_Data import column_values, trial_order, trial_values
+
+METRICS_SUFFIX = '_metrics.csv'
+METRICS_COLUMNS = ['trial_no', 'accept', 'unsure', 'reaction_time', 'movement_time', 'peak_velocity',
+                   'peak_velocity_time', 'path_length', 'angular_error']
+
+
+def metrics_path(output_address):
+    """
+    The metrics_path method returns the location of the metrics table of an output file
+    :param output_address: A string identifying the output csv file
+    :return: A string identifying the metrics csv file, next to the output file
+    """
+    return os.path.splitext(output_address)[0] + METRICS_SUFFIX
+
+
+def trial_metrics(experiment):
+    """
+    The trial_metrics method summarizes the selection of every trial of an experiment in one row, computed for all
+    trials at once from the selected and max_velocity samples. Times are in ms from the first sample of the trial:
+    reaction_time is the time of the first selected sample (p1) and peak_velocity_time the time of the max velocity
+    sample. movement_time is the time from p1 to the last selected sample (p2), peak_velocity the hand speed at the max
+    velocity sample in cm/s and path_length the length of the hand path between p1 and p2 in cm. angular_error is the
+    angle in degrees, counterclockwise positive, from the direction of the target to the direction of the hand at max
+    velocity, both seen from the hand at p1. The target is targetx_cm/targety_cm, or targetangle_deg when the data has
+    no target position. Trials without a selection have no values. When the experiment was scored (see score_trials)
+    the confidence and flagged columns of the scores are added.
+    :param experiment: An experiment configuration dictionary as returned by set_data
+    :return: A pandas dataframe with one row per trial, in the order of experiment['trials'], and METRICS_COLUMNS
+    """
+    order, lengths = trial_order(experiment)
+    starts = np.cumsum(lengths) - lengths
+    nsamples = len(order)
+    time_ms = column_values(experiment, 'time_ms')[order].astype('float')
+    handx = column_values(experiment, 'handx_cm')[order].astype('float')
+    handy = column_values(experiment, 'handy_cm')[order].astype('float')
+    selected = column_values(experiment, 'selected')[order] == 1
+    peak = column_values(experiment, 'max_velocity')[order] == 1
+
+    # the first and last selected and the first max velocity sample of every trial, nsamples when there is none
+    sample = np.arange(nsamples)
+    p1 = np.minimum.reduceat(np.where(selected, sample, nsamples), starts)
+    p2 = np.maximum.reduceat(np.where(selected, sample, -1), starts)
+    peak = np.minimum.reduceat(np.where(peak, sample, nsamples), starts)
+    has_selection, has_peak = p1 < nsamples, peak < nsamples
+    p1, p2, peak = [np.where(found, idx, starts) for found, idx in [(has_selection, p1), (has_selection, p2),
+                                                                    (has_peak, peak)]]
+
+    # the hand speed and path segments end at a sample and start at the one before it in the same trial
+    distance = np.zeros(nsamples)
+    distance[1:] = np.hypot(np.diff(handx), np.diff(handy))
+    interval = np.ones(nsamples)
+    interval[1:] = np.diff(time_ms)
+    distance[starts] = 0
+    speed = np.divide(distance, interval, out=np.zeros(nsamples), where=interval != 0) * 1000
+    in_path = selected.copy()
+    in_path[starts] = False
+    in_path[1:] &= selected[:-1]
+    path_length = np.add.reduceat(np.where(in_path, distance, 0), starts)
+
+    try:
+        targetx = column_values(experiment, 'targetx_cm')[order].astype('float')
+        targety = column_values(experiment, 'targety_cm')[order].astype('float')
+        target_angle = np.arctan2(targety[p1] - handy[p1], targetx[p1] - handx[p1])
+    except KeyError:
+        target_angle = np.radians(column_values(experiment, 'targetangle_deg')[order][starts].astype('float'))
+    hand_angle = np.arctan2(handy[peak] - handy[p1], handx[peak] - handx[p1])
+    angular_error = np.degrees(np.angle(np.exp(1j * (hand_angle - target_angle))))
+
+    trial_start = time_ms[starts]
+    metrics = pd.DataFrame({'trial_no': experiment['trials'],
+                            'accept': trial_values(experiment, 'accept'),
+                            'unsure': trial_values(experiment, 'unsure'),
+                            'reaction_time': np.where(has_selection, time_ms[p1] - trial_start, np.nan),
+                            'movement_time': np.where(has_selection, time_ms[p2] - time_ms[p1], np.nan),
+                            'peak_velocity': np.where(has_peak, speed[peak], np.nan),
+                            'peak_velocity_time': np.where(has_peak, time_ms[peak] - trial_start, np.nan),
+                            'path_length': np.where(has_selection, path_length, np.nan),
+                            'angular_error': np.where(has_selection & has_peak, angular_error, np.nan)},
+                           columns=METRICS_COLUMNS)
+    if experiment.get('scores') is not None:
+        metrics['confidence'] = experiment['scores']['confidence'].values
+        metrics['flagged'] = experiment['scores']['flagged'].values.astype(int)
+    return metrics
+
+
+def write_metrics(experiment, metrics_address, append=False):
+    """
+    The write_metrics method writes the metrics table of an experiment, see trial_metrics
+    :param experiment: An experiment configuration dictionary as returned by set_data
+    :param metrics_address: A string identifying the metrics csv file, see metrics_path
+    :param append: True to append the rows to the table, without its header, as run_stream does
+    :return: The metrics dataframe
+    """
+    metrics = trial_metrics(experiment)
+    metrics.to_csv(metrics_address, index=False, header=not append, mode='a' if append else 'w')
+    return metrics
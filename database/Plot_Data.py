@@ -1,8 +1,13 @@
+import collections
+
 import matplotlib.patches as patches
 import numpy as np
 from matplotlib import pyplot as plt
-from scipy import signal
-from scipy.interpolate import interp1d
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_rgba_array
+
+from database.Read_Data import column_values, trial_order, trial_values
+from database.Select_Data import session_profile, time_index, velocityselect, velocityupdate
 
 # Turn interactive plotting off
 plt.ioff()
@@ -36,107 +41,17 @@ def reach_profiler(data, setting, targets):
     return reachprofile(data, setting, targets)
 
 
-def velocityupdate(data):
-    """
-    The velocityupdate method calculates the max velocity position based on the interpolated data
-    :param data: A Pandas dataframe for one trial.  The dataframe must also hold the interpolated information as an attribute
-    :return: Returns a max_position list
-    """
-    start_time = data.selectedp1
-    end_time = data.selectedp2
-    selection_index = [_ for _, val in enumerate(data.Interpolated[1]) if val > start_time and val < end_time]
-    interpolated_speed, interpolated_time = data.Interpolated[0][selection_index], data.Interpolated[1][selection_index]
-    maxspeedidx = interpolated_speed.argmax()
-    data.selectedmaxvelocity = interpolated_time[maxspeedidx]
-    max_position = [data.handx_cm.iloc[maxspeedidx], data.handy_cm.iloc[maxspeedidx]]
-    return max_position
-
-
-def velocityprofile(data):
+def velocityprofile(data, setting=None):
     """
-    The velocityprofile method calculates interpolated data if not already done, sets p1,p2 and max velocity and
-    creates an appropriate figure
+    The velocityprofile method calls velocityselect to set p1,p2 and max velocity and creates an appropriate figure
     :param data: Pandas dataframe with information about about one trial
+    :param setting: Setting dictionary, for its 'Resampling' block
     :return: Returns a figure and a max_position list.
     """
-    if not (hasattr(data, 'Interpolated_speed')):
-        # VelocityPorfile/ Interpolate and draw
-        if 'handx_cm' in data.keys():
-            xpoly, ypoly = interp1d(data['time_ms'], data.handx_cm), interp1d(data['time_ms'], data.handy_cm)
-        else:
-            raise Exception('There is no hand data, please check your settings')
-
-        ## Time calculations
-        interpolated_time = np.linspace(data['time_ms'].iloc[0], data['time_ms'].iloc[-1], endpoint=True)
-        xpoly, ypoly = xpoly(interpolated_time), ypoly(interpolated_time)
-
-        nyquist = data['time_ms'].diff().mean()
-        filter_freq = 3
-        [b, a] = signal.butter(1, filter_freq / nyquist, 'low')
-        xpoly, ypoly = signal.filtfilt(b, a, xpoly), signal.filtfilt(b, a, ypoly)
-        interpolated_speed = np.append(0, calculate_speeds(xpoly, ypoly, interpolated_time))
-
-        # adding it to our trialdata object in  gui.mainwindow
-        data.Interpolated = [interpolated_speed,
-                             interpolated_time]  # we can treat data as-if it was passed by reference here
-
-        data.RealSpeed = calculate_speeds(data.handx_cm.astype('float'), data.handy_cm.astype('float'),
-                                          data['time_ms'])
-
-        max_velocity = interpolated_speed.max()
-        p1_speed = max_velocity * 0.1
-        p1idx = np.argmax(interpolated_speed > p1_speed)
-        maxspeedidx = interpolated_speed.argmax()
-        p2idx = maxspeedidx + 1 + np.argmax(interpolated_speed[maxspeedidx + 1::] <= p1_speed)
-        data.selectedp1 = next(x for x in data['time_ms'] if x > interpolated_time[p1idx])
-        data.selectedp2 = next(x for x in data['time_ms'] if x >= interpolated_time[p2idx])
-        data.selectedmaxvelocity = interpolated_time[maxspeedidx]
-        data.selected = 0
-        selectedindex = (data['time_ms'] >= data.selectedp1) & (data['time_ms'] <= data.selectedp2)
-        data.selected[selectedindex] = 1
-
-    selection_starttime = data[data.selected == 1].iloc[0].time_ms
-    selection_endtime = data[data.selected == 1].iloc[-1].time_ms
-
-    interpolated_time = data.Interpolated[1][
-        (data.Interpolated[1] > selection_starttime) & (data.Interpolated[1] < selection_endtime)]
-    interpolated_speed = data.Interpolated[0][
-        (data.Interpolated[1] > selection_starttime) & (data.Interpolated[1] < selection_endtime)]
-    interpolated_selected_idx = np.where(
-        (data.Interpolated[1] > selection_starttime) & (data.Interpolated[1] < selection_endtime))
-
-    maxspeed = interpolated_speed.max()
-    maxspeedidx = np.where(data.Interpolated[0] == maxspeed)[0][0]
-    data.selectedmaxvelocity = data.Interpolated[1][maxspeedidx]
-
-    p1_speed = data.selectedmaxvelocity * 0.1
-    try:
-        p1_speed = interpolated_speed[interpolated_speed > p1_speed][0]
-    except(IndexError):
-        p1_speed = interpolated_speed[0]
-
-    if p1_speed == maxspeed:
-        p1_idx = maxspeedidx - 1
-    else:
-        p1_idx = np.where(data.Interpolated[0] == p1_speed)[0][0]
-
-    data.selectedp1 = next(x for x in data['time_ms'] if x > data.Interpolated[1][p1_idx])
-    p2_idx = np.argmax(data.Interpolated[0][maxspeedidx + 1::] < (maxspeed * 0.1))
-    if p2_idx == 0:
-        p2_idx = -2
-    else:
-        p2_idx += maxspeedidx + 1
-    data.selectedp2 = next(x for x in data['time_ms'] if x > data.Interpolated[1][p2_idx])
-    maxspeedidx = np.where(data.time_ms >= data.selectedmaxvelocity)[0][0]
-    max_position = [data.handx_cm.iloc[maxspeedidx], data.handy_cm.iloc[maxspeedidx]]
+    max_position = velocityselect(data, setting)
 
     fig = plt.figure(facecolor='gray', edgecolor='r')
-    ax = fig.add_axes([0.1, 0.2, 0.8, 0.6])
-
-    ax.plot(data.Interpolated[1], data.Interpolated[0])
-    ax.axvline(data.selectedmaxvelocity, ymax=max(data.Interpolated[1]), color='r', label='velocity')
-    ax.axvline(data.selectedp1, ymax=max(data.Interpolated[1]), color='b', label='p1')
-    ax.axvline(data.selectedp2, ymax=max(data.Interpolated[1]), color='b', label='p2')
+    VelocityPlot(fig).update(data)
     plt.close()
     return fig, max_position
 
@@ -149,10 +64,24 @@ def reachprofile(data, setting, targets):
     :param targets: List of all the targets in the loaded experiment
     :return: Returns the reachprofile figure
     """
+    fig2 = plt.figure(facecolor='gray', edgecolor='b')
+    ReachPlot(fig2, setting, targets).update(data)
+    plt.close()
+
+    return fig2
+
+
+def reach_data(data, setting):
+    """
+    The reach_data method calculates everything the reach plot shows for the selected samples of one trial
+    :param data: Pandas dataframe with information about about one trial, with selected and selectedmaxvelocity set
+    :param setting: Setting dictionary for the loaded experiment
+    :return: A dictionary holding the hand and cursor paths, the positions of the target, the home and of the hand
+    and cursor at max velocity, and the square limits of the plot
+    """
     selected_data = data.index[data.selected == 1].tolist()
     reachplotdata = data.loc[selected_data].copy()
-    maxspeedidx = next(
-        _ for _, x in enumerate(reachplotdata['time_ms']) if x >= data.selectedmaxvelocity.astype('float'))
+    maxspeedidx = time_index(reachplotdata.time_ms.values, float(data.selectedmaxvelocity))
 
     max_pen_position = [float(reachplotdata.handx_cm.iloc[maxspeedidx]),
                         float(reachplotdata.handy_cm.iloc[maxspeedidx])]
@@ -160,16 +89,9 @@ def reachprofile(data, setting, targets):
     max_cursor_position = [float(reachplotdata.cursorx_cm.iloc[maxspeedidx]),
                            float(reachplotdata.cursory_cm.iloc[maxspeedidx])]
 
-    # ReachProfile/ draw
     target_locations = np.unique(
         list(zip(list(reachplotdata.targetx_cm.astype('float')), list(reachplotdata.targety_cm.astype('float')))),
         axis=0)
-    trial_target = patches.Circle(target_locations[0], radius=.5, color='g', fill=True)
-    max_penvelocity = patches.Circle(max_pen_position, radius=.5, color='b', fill=True)
-    max_cursorvelocity = patches.Circle(max_cursor_position, radius=.5, color='b', fill=True)
-    fig2 = plt.figure(facecolor='gray', edgecolor='b')
-    ax = fig2.add_subplot(111)
-    ax.set_aspect('equal')
 
     # if setting['Display Origin'] == ['', '', '']:
     range = reachplotdata.cursorx_cm.max() - reachplotdata.cursorx_cm.min()
@@ -177,53 +99,454 @@ def reachprofile(data, setting, targets):
     range = reachplotdata.cursory_cm.max() - reachplotdata.cursory_cm.min()
     disprange_y = [reachplotdata.cursory_cm.min() - (range / 2), reachplotdata.cursory_cm.max() + (range / 2)]
 
-    xleft = disprange_x[0]
-    xright = disprange_x[1]
-    ydown = disprange_y[0]
-    yup = disprange_y[1]
-    left = min(xleft, ydown)
-    right = max(xright, yup)
-
-    ax.set_ylim([left, right])
-    ax.set_xlim([left, right])
-
-    ax.plot(reachplotdata.handx_cm.astype('float'), reachplotdata.handy_cm.astype('float'), 'g', linestyle=' ',
-            marker="o", fillstyle='none')
-    ax.plot(reachplotdata.cursorx_cm.astype('float'), reachplotdata.cursory_cm.astype('float'), 'r')
-
-    for target in targets:
-        all_targets = patches.Circle(target, radius=.5, color='g', fill=False)
-        ax.add_patch(all_targets)
+    left = min(disprange_x[0], disprange_y[0])
+    right = max(disprange_x[1], disprange_y[1])
 
     if setting['Display Origin'] and 'homex_px' in data.keys():
-        homepos_x = (float(data.homex_px[0]) - setting['Display Origin'][0]) * float(setting['PX_CM_Ratio'])
-        homepos_y = (float(data.homey_px[0]) - setting['Display Origin'][1]) * float(setting['PX_CM_Ratio'])
+        homepos_x = (float(data.homex_px.iloc[0]) - setting['Display Origin'][0]) * float(setting['PX_CM_Ratio'])
+        homepos_y = (float(data.homey_px.iloc[0]) - setting['Display Origin'][1]) * float(setting['PX_CM_Ratio'])
     else:
         homepos_x = 0
         homepos_y = -8.5
 
-    home = patches.Circle([homepos_x, homepos_y], radius=.5, color='yellow', fill=True)
-    ax.add_patch(home)
+    return {'hand': [reachplotdata.handx_cm.values.astype('float'), reachplotdata.handy_cm.values.astype('float')],
+            'cursor': [reachplotdata.cursorx_cm.values.astype('float'),
+                       reachplotdata.cursory_cm.values.astype('float')],
+            'target': target_locations[0],
+            'max_pen_position': max_pen_position,
+            'max_cursor_position': max_cursor_position,
+            'home': [homepos_x, homepos_y],
+            'limits': [left, right]}
 
-    ax.add_patch(trial_target)
-    ax.add_patch(max_penvelocity)
-    ax.add_patch(max_cursorvelocity)
-    ax.legend(['Real', 'Display'])
-    plt.close()
 
-    return fig2
+class VelocityPlot:
+    """
+    VelocityPlot draws the velocity profile of a trial with its p1, p2 and max velocity lines. The axes and artists are
+    created once and only their data is changed for every trial.
+    """
+    def __init__(self, figure):
+        """
+        The constructor clears the figure and creates the axes, the speed line and the p1, p2 and max velocity lines
+        :param figure: matplotlib figure, usually the figure of the velocity canvas
+        """
+        figure.clf()
+        self.figure = figure
+        self.axes = figure.add_axes([0.1, 0.2, 0.8, 0.6])
+        self.speed_line, = self.axes.plot([], [])
+        self.speed = DetailLine(self.speed_line)
+        self.max_line = self.axes.axvline(0, color='r', label='velocity')
+        self.p1_line = self.axes.axvline(0, color='b', label='p1')
+        self.p2_line = self.axes.axvline(0, color='b', label='p2')
+
+    def update(self, data):
+        """
+        The update method shows the velocity profile and selection of a trial
+        :param data: Pandas dataframe for one trial, as set by velocityselect
+        """
+        interpolated_speed, interpolated_time = data.Interpolated
+        self.speed.set_data(interpolated_time, interpolated_speed)
+        self.set_selection(data.selectedp1, data.selectedp2, data.selectedmaxvelocity)
+        self.axes.relim()
+        self.axes.autoscale_view()
+
+    def set_selection(self, p1, p2, max_velocity):
+        """
+        The set_selection method moves the p1, p2 and max velocity lines
+        :param p1: time of p1
+        :param p2: time of p2
+        :param max_velocity: time of max velocity
+        """
+        self.p1_line.set_xdata([p1, p1])
+        self.p2_line.set_xdata([p2, p2])
+        self.max_line.set_xdata([max_velocity, max_velocity])
+
+
+class ReachPlot:
+    """
+    ReachPlot draws the real and display reach of a trial with the targets of the experiment. The axes, lines and
+    circles are created once per experiment and only moved for every trial.
+    """
+    def __init__(self, figure, setting, targets):
+        """
+        The constructor clears the figure and creates the axes, the hand and cursor lines and the target, home and max
+        velocity circles
+        :param figure: matplotlib figure, usually the figure of the reach canvas
+        :param setting: Setting dictionary for the loaded experiment
+        :param targets: List of all the targets in the loaded experiment
+        """
+        figure.clf()
+        self.figure = figure
+        self.setting = setting
+        self.axes = figure.add_subplot(111)
+        self.axes.set_aspect('equal')
+        self.hand_line, = self.axes.plot([], [], 'g', linestyle=' ', marker="o", fillstyle='none')
+        self.cursor_line, = self.axes.plot([], [], 'r')
+        self.hand = DetailLine(self.hand_line, path=True)
+        self.cursor = DetailLine(self.cursor_line, path=True)
+
+        for target in targets:
+            self.axes.add_patch(patches.Circle(target, radius=.5, color='g', fill=False))
+
+        self.home = self.axes.add_patch(patches.Circle([0, 0], radius=.5, color='yellow', fill=True))
+        self.trial_target = self.axes.add_patch(patches.Circle([0, 0], radius=.5, color='g', fill=True))
+        self.max_penvelocity = self.axes.add_patch(patches.Circle([0, 0], radius=.5, color='b', fill=True))
+        self.max_cursorvelocity = self.axes.add_patch(patches.Circle([0, 0], radius=.5, color='b', fill=True))
+        self.axes.legend(['Real', 'Display'])
+
+    def update(self, data):
+        """
+        The update method shows the selected reach of a trial
+        :param data: Pandas dataframe for one trial, with selected and selectedmaxvelocity set, or the dictionary
+        returned by reach_data for it
+        """
+        reach = data if isinstance(data, dict) else reach_data(data, self.setting)
+        self.hand.set_data(*reach['hand'])
+        self.cursor.set_data(*reach['cursor'])
+        self.home.center = reach['home']
+        self.trial_target.center = reach['target']
+        self.max_penvelocity.center = reach['max_pen_position']
+        self.max_cursorvelocity.center = reach['max_cursor_position']
+        self.axes.set_xlim(reach['limits'])
+        self.axes.set_ylim(reach['limits'])
+
+    def show_selection(self, data, p1, p2, max_velocity):
+        """
+        The show_selection method moves the reach and the max velocity circles to a new selection without changing the
+        limits of the plot, for updates while the selection is dragged
+        :param data: Pandas dataframe for one trial
+        :param p1: time of p1
+        :param p2: time of p2
+        :param max_velocity: time of max velocity
+        """
+        time_ms = data.time_ms.values
+        selection = slice(np.searchsorted(time_ms, min(p1, p2)), np.searchsorted(time_ms, max(p1, p2), side='right'))
+        if selection.start >= selection.stop:
+            return
+        self.hand.set_data(data.handx_cm.values[selection], data.handy_cm.values[selection])
+        self.cursor.set_data(data.cursorx_cm.values[selection], data.cursory_cm.values[selection])
+        maxspeedidx = selection.start + time_index(time_ms[selection], max_velocity)
+        self.max_penvelocity.center = [data.handx_cm.values[maxspeedidx], data.handy_cm.values[maxspeedidx]]
+        self.max_cursorvelocity.center = [data.cursorx_cm.values[maxspeedidx], data.cursory_cm.values[maxspeedidx]]
+
+
+class DetailLine:
+    """
+    DetailLine shows a series on a line with at most two points per pixel of the width of its axes, so that drawing
+    time does not grow with the sampling rate. The full series is kept and decimated again for the visible range
+    whenever the limits of the axes change, so zooming in shows more detail.
+    """
+    def __init__(self, line, path=False):
+        """
+        The constructor connects the line to the limit changes of its axes
+        :param line: matplotlib Line2D
+        :param path: False for a series with increasing x (such as a velocity profile), True for a path (such as a
+        reach), which is decimated keeping the extremes of both coordinates
+        """
+        self.line = line
+        self.path = path
+        self.x, self.y = np.empty(0), np.empty(0)
+        line.axes.callbacks.connect('xlim_changed', self.refine)
+        line.axes.callbacks.connect('ylim_changed', self.refine)
+
+    def set_data(self, x, y):
+        """
+        The set_data method sets the full series and shows all of it decimated, not only the part inside the current
+        limits, so that the axes can be scaled to the new series before refine decimates what is visible
+        :param x: array of x values
+        :param y: array of y values
+        """
+        self.x, self.y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        self.show(0, len(self.x))
+
+    def refine(self, axes=None):
+        """
+        The refine method decimates the visible part of the series for the current limits and size of the axes
+        :param axes: the axes whose limits changed, not used
+        """
+        self.show(*visible_range(self.x, self.y, self.line.axes.get_xlim(), self.line.axes.get_ylim(), self.path))
+
+    def show(self, first, last):
+        """
+        The show method draws the samples from first to last decimated to the width of the axes
+        :param first: the first sample shown
+        :param last: the sample after the last one shown
+        """
+        x, y = self.x, self.y
+        npoints = max(2 * int(self.line.axes.get_window_extent().width), 4)
+        rows = first + decimate(x[first:last], y[first:last], npoints, self.path)
+        self.line.set_data(x[rows], y[rows])
+
+
+def visible_range(x, y, xlim, ylim, path=False):
+    """
+    The visible_range method finds the samples of a series that are inside the limits of its axes, with one more sample
+    on either side so that the line reaches the edges
+    :param x: array of x values, increasing unless path is True
+    :param y: array of y values
+    :param xlim: the x limits of the axes
+    :param ylim: the y limits of the axes
+    :param path: False for a series with increasing x, True for a path
+    :return: the first sample and the sample after the last. All samples when none is visible
+    """
+    if path:
+        inside = np.flatnonzero((x >= min(xlim)) & (x <= max(xlim)) & (y >= min(ylim)) & (y <= max(ylim)))
+        if not inside.size:
+            return 0, len(x)
+        first, last = inside[0], inside[-1] + 1
+    else:
+        first, last = np.searchsorted(x, min(xlim)), np.searchsorted(x, max(xlim), side='right')
+        if first >= last:
+            return 0, len(x)
+    return max(first - 1, 0), min(last + 1, len(x))
 
 
-def calculate_speeds(x, y, Time):
+def decimate(x, y, npoints, path=False):
+    """
+    The decimate method picks at most about npoints samples of a series that look the same when drawn: the samples are
+    split into equal buckets and the ones with the smallest and largest y (and x for a path) of every bucket are kept,
+    along with the first and last sample.
+    :param x: array of x values
+    :param y: array of y values
+    :param npoints: the number of samples wanted, usually twice the width of the axes in pixels
+    :param path: False to keep the extremes of y only, True to keep the extremes of both x and y
+    :return: A sorted array of the kept sample positions
+    """
+    nsamples = len(x)
+    columns = [x, y] if path else [y]
+    nbuckets = max(npoints // (2 * len(columns)), 1)
+    if nsamples <= npoints or nsamples < 2 * nbuckets:
+        return np.arange(nsamples)
+
+    size = nsamples // nbuckets
+    starts = np.arange(nbuckets) * size
+    tail = nbuckets * size  # the samples left over after the buckets form one more bucket
+    kept = [np.array([0, nsamples - 1])]
+    for values in columns:
+        buckets = values[:tail].reshape(nbuckets, size)
+        kept += [starts + buckets.argmin(axis=1), starts + buckets.argmax(axis=1)]
+        if tail < nsamples:
+            kept.append(tail + np.array([values[tail:].argmin(), values[tail:].argmax()]))
+    return np.unique(np.concatenate(kept))
+
+
+class Blitter:
+    """
+    Blitter redraws a few artists of a canvas over a cached background of everything else, so that moving them does not
+    redraw the whole figure.
+    """
+    def __init__(self, canvas, artists):
+        """
+        The constructor connects the blitter to the draw events of the canvas
+        :param canvas: matplotlib canvas
+        :param artists: list of the artists that move
+        """
+        self.canvas = canvas
+        self.artists = artists
+        self.background = None
+        self.active = False
+        self.cid = canvas.mpl_connect('draw_event', self.on_draw)
+
+    def start(self):
+        """
+        The start method takes the artists out of the normal drawing and caches the background without them
+        """
+        self.active = True
+        for artist in self.artists:
+            artist.set_animated(True)
+        self.canvas.draw()
+
+    def on_draw(self, event):
+        """
+        The on_draw method caches the background whenever the whole canvas is drawn while the blitter is active
+        :param event: matplotlib draw event
+        """
+        if self.active:
+            self.background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+            self.draw_artists()
+
+    def update(self):
+        """
+        The update method restores the background and draws only the artists
+        """
+        if self.background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self.background)
+        self.draw_artists()
+        self.canvas.blit(self.canvas.figure.bbox)
+
+    def draw_artists(self):
+        for artist in self.artists:
+            artist.axes.draw_artist(artist)
+
+    def stop(self):
+        """
+        The stop method puts the artists back into the normal drawing and redraws the canvas
+        """
+        self.active = False
+        self.background = None
+        for artist in self.artists:
+            artist.set_animated(False)
+        self.canvas.draw_idle()
+
+    def disconnect(self):
+        self.canvas.mpl_disconnect(self.cid)
+
+
+class SelectionDragger:
+    """
+    SelectionDragger lets the user drag the p1, p2 and max velocity lines of a VelocityPlot. The lines are moved with
+    blitting while dragging.
+    """
+    def __init__(self, velocity_plot, on_move=None, on_release=None, tolerance=5):
+        """
+        The constructor connects the dragger to the mouse events of the canvas of the plot. Presses are passed on by
+        the owner of the canvas through press, so that clicks away from the lines can be handled as before.
+        :param velocity_plot: VelocityPlot instance
+        :param on_move: Optional callable taking (line name, time), called while a line is dragged
+        :param on_release: Optional callable taking (line name, time), called when a line is dropped
+        :param tolerance: distance in pixels from a line to start dragging it
+        """
+        self.plot = velocity_plot
+        self.lines = collections.OrderedDict(
+            [('p1', velocity_plot.p1_line), ('p2', velocity_plot.p2_line), ('max_velocity', velocity_plot.max_line)])
+        self.on_move = on_move
+        self.on_release_callback = on_release
+        self.tolerance = tolerance
+        self.dragging = None
+        self.canvas = velocity_plot.figure.canvas
+        self.blitter = Blitter(self.canvas, list(self.lines.values()))
+        self.cids = [self.canvas.mpl_connect('motion_notify_event', self.on_motion),
+                     self.canvas.mpl_connect('button_release_event', self.on_release)]
+
+    def press(self, event):
+        """
+        The press method starts dragging the line closest to a mouse press
+        :param event: matplotlib mouse event
+        :return: True if a line is being dragged, False if the press was not close to a line
+        """
+        if event.inaxes is not self.plot.axes or event.x is None:
+            return False
+        distances = collections.OrderedDict(
+            (name, abs(self.plot.axes.transData.transform((line.get_xdata()[0], 0))[0] - event.x))
+            for name, line in self.lines.items())
+        name = min(distances, key=distances.get)
+        if distances[name] > self.tolerance:
+            return False
+        self.dragging = name
+        self.blitter.start()
+        return True
+
+    def on_motion(self, event):
+        if self.dragging is None or event.inaxes is not self.plot.axes or event.xdata is None:
+            return
+        self.lines[self.dragging].set_xdata([event.xdata, event.xdata])
+        self.blitter.update()
+        if self.on_move is not None:
+            self.on_move(self.dragging, event.xdata)
+
+    def on_release(self, event):
+        if self.dragging is None:
+            return
+        name, self.dragging = self.dragging, None
+        self.blitter.stop()
+        if self.on_release_callback is not None:
+            self.on_release_callback(name, self.lines[name].get_xdata()[0])
+
+    def disconnect(self):
+        """
+        The disconnect method removes the dragger from the canvas, for when the plot is replaced
+        """
+        for cid in self.cids:
+            self.canvas.mpl_disconnect(cid)
+        self.blitter.disconnect()
+
+
+# The colours of the trials in the overview, by their accept value, and of unsure trials
+STATUS_COLOURS = {1: 'tab:green', -1: 'tab:red', 0: 'lightgray', 'unsure': 'orange'}
+
+
+class OverviewPlot:
     """
-    The calculate speed method calculates 2D cartesian velocity
-    :param x: numpy array of the x_cordinates of the data
-    :param y: numpy array of the y_cordinates of the data
-    :param Time: numpy array of the time_cordinates of the data
-    :return: numpy array of the caluclated velocity
+    OverviewPlot draws every trial of an experiment at once: the speed profiles as the rows of one image, next to a
+    strip showing the status of each trial, and the hand paths as one LineCollection coloured by status. Drawing a
+    single artist per panel keeps sessions of thousands of trials fast.
     """
-    [xdiff, ydiff, timediff] = map(np.diff, [x, y, Time])
-    return np.divide(np.sqrt(np.add(np.square(xdiff), np.square(ydiff))), timediff)
+    def __init__(self, figure, experiment, npoints=100, setting=None):
+        """
+        The constructor clears the figure and draws the speed image, the status strip and the hand paths
+        :param figure: matplotlib figure, usually the figure of the overview canvas
+        :param experiment: An experiment configuration dictionary as returned by set_data
+        :param npoints: number of samples drawn per trial
+        :param setting: Setting dictionary, for the filter of its 'Resampling' block
+        """
+        figure.clf()
+        self.figure = figure
+        self.trials = experiment['trials']
+        self.speed_axes = figure.add_axes([0.06, 0.08, 0.38, 0.86])
+        self.status_axes = figure.add_axes([0.45, 0.08, 0.015, 0.86], sharey=self.speed_axes)
+        self.path_axes = figure.add_axes([0.53, 0.08, 0.44, 0.86])
+
+        profile = session_profile(experiment, setting, npoints)
+        peak_speed = profile['speed'].max(axis=1)
+        peak_speed = np.where(peak_speed > 0, peak_speed, 1)
+        extent = (0, 1, len(self.trials) - 0.5, -0.5)  # row i is centred on y = i
+        self.speed_axes.imshow(profile['speed'] / peak_speed[:, None], aspect='auto', interpolation='nearest',
+                               cmap='viridis', extent=extent)
+        self.speed_axes.set_xlabel('time (normalized)')
+        self.speed_axes.set_ylabel('trial')
+        self.speed_axes.yaxis.set_major_formatter(plt.FuncFormatter(self.trial_label))
+        self.status_image = self.status_axes.imshow(np.zeros((len(self.trials), 1, 4)), aspect='auto',
+                                                    interpolation='nearest', extent=(0, 1) + extent[2:])
+        self.status_axes.set_xticks([])
+        self.status_axes.tick_params(labelleft=False)
+
+        order, lengths = trial_order(experiment)
+        starts = np.cumsum(lengths) - lengths
+        samples = starts[:, None] + np.round(np.linspace(0, 1, npoints)[None, :] * (lengths - 1)[:, None]).astype(int)
+        rows = order[samples]
+        paths = np.stack([column_values(experiment, 'handx_cm')[rows], column_values(experiment, 'handy_cm')[rows]],
+                         axis=-1).astype(float)
+        self.paths = LineCollection(paths, linewidths=0.5, picker=True)
+        self.paths.set_pickradius(3)
+        self.path_axes.add_collection(self.paths)
+        self.path_axes.set_aspect('equal', adjustable='datalim')
+        self.path_axes.autoscale_view()
+        self.update_status(experiment)
+
+    def update_status(self, experiment):
+        """
+        The update_status method colours the status strip and the hand paths by the accept and unsure values
+        :param experiment: An experiment configuration dictionary as returned by set_data
+        """
+        accept = trial_values(experiment, 'accept')
+        names = np.where(accept == 1, STATUS_COLOURS[1], np.where(accept == -1, STATUS_COLOURS[-1], STATUS_COLOURS[0]))
+        names[trial_values(experiment, 'unsure') == 1] = STATUS_COLOURS['unsure']
+        colours = to_rgba_array(list(names))
+        self.status_image.set_data(colours[:, None, :])
+        self.paths.set_color(colours)
+
+    def trial_label(self, value, position):
+        """
+        The trial_label method labels the ticks of the speed image with trial numbers instead of rows
+        """
+        row = int(round(value))
+        return '%g' % self.trials[row] if 0 <= row < len(self.trials) else ''
+
+    def trial_at(self, event):
+        """
+        The trial_at method finds the trial clicked on, from a button press on the speed image or status strip or from a
+        pick of a hand path
+        :param event: matplotlib button_press_event or pick_event
+        :return: the trial number (NOT INDEX), None when no trial was clicked
+        """
+        if getattr(event, 'artist', None) is self.paths:
+            return self.trials[event.ind[0]]
+        if getattr(event, 'inaxes', None) in (self.speed_axes, self.status_axes) and event.ydata is not None:
+            row = int(round(event.ydata))
+            if 0 <= row < len(self.trials):
+                return self.trials[row]
+        return None
 
 
 def find_position(data, time, velocity):
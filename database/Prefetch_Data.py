@@ -0,0 +1,190 @@
+import collections
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from database.Plot_Data import reach_data
+from database.Read_Data import trial_frame
+from database.Select_Data import velocityselect
+
+# The attributes velocityselect sets on a trial dataframe. DataFrame.copy does not keep them.
+PROFILE_ATTRIBUTES = ('Interpolated', 'RealSpeed', 'selectedp1', 'selectedp2', 'selectedmaxvelocity')
+
+# The number of trials prefetched ahead when the setting has no valid Prefetch Depth.
+PREFETCH_DEPTH = 3
+
+
+def prefetch_depth(setting):
+    """
+    The prefetch_depth method reads the Prefetch Depth of a setting. The setting window saves it as free text, so a
+    value that is not a whole number of at least 1 falls back to PREFETCH_DEPTH.
+    :param setting: Setting dictionary for the loaded experiment
+    :return: the number of trials to prefetch ahead
+    """
+    try:
+        depth = int(setting.get('Prefetch Depth'))
+    except (TypeError, ValueError):
+        return PREFETCH_DEPTH
+    return depth if depth >= 1 else PREFETCH_DEPTH
+
+
+def profile_trial(experiment, setting, trial):
+    """
+    The profile_trial method does all the work needed to show a trial: it reads the trial, runs velocityselect and
+    calculates the reach plot data for the selection
+    :param experiment: An experiment configuration dictionary as returned by set_data
+    :param setting: Setting dictionary for the loaded experiment
+    :param trial: the trial number (NOT INDEX)
+    :return: the trial dataframe, the max_position list and the reach_data dictionary
+    """
+    return profile_frame(trial_frame(experiment, trial), setting)
+
+
+def profile_frame(trial_data, setting):
+    """
+    The profile_frame method is profile_trial for a trial that is already read. It only uses its own trial dataframe,
+    so it can run in another thread while the experiment is changed.
+    :param trial_data: Pandas dataframe for one trial, as returned by trial_frame
+    :param setting: Setting dictionary for the loaded experiment
+    :return: the trial dataframe, the max_position list and the reach_data dictionary
+    """
+    max_position = velocityselect(trial_data, setting)
+    selection = trial_data.index[trial_data.time_ms.between(trial_data.selectedp1, trial_data.selectedp2)]
+    trial_data.loc[selection, 'selected'] = 1
+    return trial_data, max_position, reach_data(trial_data, setting)
+
+
+def copy_profile(trial_data):
+    """
+    The copy_profile method copies a trial dataframe together with its velocityselect attributes
+    :param trial_data: Pandas dataframe for one trial, as returned by profile_trial
+    :return: the copy
+    """
+    copy = trial_data.copy()
+    for name in PROFILE_ATTRIBUTES:
+        object.__setattr__(copy, name, getattr(trial_data, name))
+    return copy
+
+
+class TrialPrefetcher:
+    """
+    TrialPrefetcher computes the profiles of the trials around the current one in a background thread and keeps them
+    in a bounded least-recently-used cache, so that moving to the next or previous trial only has to draw. The trials
+    are read from the experiment when they are submitted, on the thread that also stores them (see store_trial), so the
+    worker never reads the experiment while it is written.
+    """
+    def __init__(self, experiment, setting, depth=3, cache_size=16):
+        """
+        The constructor creates the worker thread pool and the empty cache
+        :param experiment: An experiment configuration dictionary as returned by set_data
+        :param setting: Setting dictionary for the loaded experiment
+        :param depth: number of trials after the current one that are prefetched (the one before is prefetched too)
+        :param cache_size: number of trials kept in the cache
+        """
+        self.experiment = experiment
+        self.setting = setting
+        self.depth = depth
+        self.cache_size = max(cache_size, depth + 2)
+        self.cache = collections.OrderedDict()
+        self.pending = {}
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def get(self, trial):
+        """
+        The get method returns the profile of a trial, from the cache, from the running prefetch or computed right away
+        :param trial: the trial number (NOT INDEX)
+        :return: a copy of the trial dataframe, the max_position list and the reach_data dictionary
+        """
+        with self.lock:
+            profile = self.cache.get(trial)
+            future = self.pending.get(trial)
+            if profile is not None:
+                self.cache.move_to_end(trial)
+        if profile is None and future is not None:
+            try:
+                profile = future.result()
+            except Exception:
+                logging.exception('prefetch of trial %s failed', trial)
+        if profile is None:
+            profile = profile_trial(self.experiment, self.setting, trial)
+            self.store(trial, profile, self.generation)
+        trial_data, max_position, reach = profile
+        return copy_profile(trial_data), list(max_position), reach
+
+    def prefetch(self, trial_index):
+        """
+        The prefetch method starts computing the trials around a trial index in the background
+        :param trial_index: the index of the current trial in experiment['trials']
+        """
+        trials = self.experiment['trials']
+        indices = list(range(trial_index + 1, min(trial_index + 1 + self.depth, len(trials))))
+        if trial_index > 0:
+            indices.append(trial_index - 1)
+        with self.lock:
+            for idx in indices:
+                trial = trials[idx]
+                if trial not in self.cache and trial not in self.pending:
+                    trial_data = trial_frame(self.experiment, trial)
+                    self.pending[trial] = self.executor.submit(self.work, trial, trial_data, self.generation)
+
+    def work(self, trial, trial_data, generation):
+        """
+        The work method runs in the worker thread and computes one trial from the trial dataframe read by prefetch
+        """
+        try:
+            profile = profile_frame(trial_data, self.setting)
+        except Exception:
+            with self.lock:
+                self.pending.pop(trial, None)
+            raise
+        self.store(trial, profile, generation, prefetched=True)
+        return profile
+
+    def store(self, trial, profile, generation, prefetched=False):
+        """
+        The store method adds a profile to the cache unless the cache was invalidated while it was computed, or, for a
+        prefetched profile, the trial was discarded
+        """
+        with self.lock:
+            if generation != self.generation or (prefetched and trial not in self.pending):
+                return
+            self.pending.pop(trial, None)
+            self.cache[trial] = profile
+            self.cache.move_to_end(trial)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def discard(self, trial):
+        """
+        The discard method removes a trial from the cache and drops its running prefetch, for when its data in the
+        experiment changed
+        :param trial: the trial number (NOT INDEX)
+        """
+        with self.lock:
+            self.cache.pop(trial, None)
+            future = self.pending.pop(trial, None)
+            if future is not None:
+                future.cancel()
+
+    def invalidate(self, setting=None):
+        """
+        The invalidate method drops all cached and running profiles, for when the settings change
+        :param setting: the new setting dictionary, if it changed
+        """
+        with self.lock:
+            self.generation += 1
+            for future in self.pending.values():
+                future.cancel()
+            self.pending.clear()
+            self.cache.clear()
+            if setting is not None:
+                self.setting = setting
+
+    def shutdown(self):
+        """
+        The shutdown method stops the worker thread without waiting for running work
+        """
+        self.invalidate()
+        self.executor.shutdown(wait=False)
@@ -1,60 +1,252 @@
+import ast
+import collections
 import json
+import os
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
 
+from database import Cache_Data, Memmap_Data
 
-def set_data(data_address, setting_locator, setting_name):
+
+class LoadCancelled(Exception):
+    """
+    LoadCancelled is raised by set_data when its cancelled callable asks to stop loading
+    """
+
+
+def set_data(data_address, setting_locator, setting_name, use_cache=True, cache_dir=None, progress=None,
+             first_trial=None, cancelled=None):
     """
-    The set_data method will load the data and format the data based on the setting
+    The set_data method will load the data and format the data based on the setting. The unified data is cached on
+    disk, keyed by the content of the data file and the setting, so that reopening an experiment skips parsing and unit
+    conversion. With the 'Memmap' setting the file is streamed into a memmapped layout instead (see Memmap_Data) and the
+    experiment is never held in memory as a whole. When any of the callables is given the file is read in chunks, so
+    that the load can report its progress, show its first trial early and be cancelled.
     :param data_address: A string identifying the location of data
     :param setting_locator: A string identifying the setting folder
     :param setting_name: A string identifying the setting name
+    :param use_cache: A boolean, set to False to always parse the data file
+    :param cache_dir: A string identifying the cache folder. Defaults to a hidden folder next to the data
+    :param progress: Optional callable taking the fraction of the file read so far
+    :param first_trial: Optional callable taking the configuration and setting dictionaries of an experiment holding
+    only the first trial, called as soon as that trial is read
+    :param cancelled: Optional callable returning True when loading should stop, which raises LoadCancelled
     :return: a configuration dictionary and a setting dictionary
     """
+    setting = load_setting(setting_locator, setting_name)
+    streaming = progress is not None or first_trial is not None or cancelled is not None
+
+    def report(fraction):
+        if cancelled is not None and cancelled():
+            raise LoadCancelled(data_address)
+        if progress is not None:
+            progress(fraction)
+
+    if setting.get('Memmap'):
+        directory = Cache_Data.memmap_path(data_address, Cache_Data.cache_key(data_address, setting), cache_dir)
+        if not use_cache or not Memmap_Data.has_layout(directory):
+            trials = watch_trials(iter_trials(data_address, setting, progress=report), setting, first_trial)
+            Memmap_Data.write_memmap((experiment['output'] for experiment in
+                                      iter_experiments(data_address, setting, trials=trials)), directory, setting)
+        report(1.0)
+        return Memmap_Data.open_memmap(directory)
+
+    if use_cache:
+        cache_file = Cache_Data.cache_path(data_address, Cache_Data.cache_key(data_address, setting), cache_dir)
+        cached = Cache_Data.load_cache(cache_file)
+        if cached is not None:
+            data, setting, trials, order, lengths = cached
+            report(1.0)
+            return set_experiment(data, setting, build_index(trials, order, lengths)), setting
+
+    if streaming:
+        trials = watch_trials(iter_trials(data_address, setting, progress=report), setting, first_trial)
+        data = pd.concat([trial_data for trial, trial_data in trials])
+    else:
+        data = pd.read_csv(data_address, **read_arguments(data_address, setting))
+        if 'selected' not in data_address:
+            data = unify_data(data, setting)  # this is to set the columns and units
+
+    trial_index = index_trials(data)
+    if use_cache:
+        Cache_Data.store_cache(cache_file, data, setting, trial_index)
+
+    return set_experiment(data, setting, trial_index), setting
+
+
+def load_setting(setting_locator, setting_name):
+    """
+    The load_setting method reads a setting file
+    :param setting_locator: A string identifying the setting folder
+    :param setting_name: A string identifying the setting name
+    :return: A setting dictionary
+    """
     setting_path = Path(setting_locator) / (setting_name + '.json')
     with open(setting_path, 'r') as fp:
-        setting = json.loads(fp.read())
+        return json.loads(fp.read())
+
+
+def iter_trials(data_address, setting, chunksize=100000, progress=None):
+    """
+    The iter_trials method reads a data file in chunks and yields its trials one at a time, so that trials can be used
+    while the rest of the file is still being read and files larger than memory can be processed. Units are unified
+    per chunk and a trial split over two chunks is put back together before it is yielded. The samples of a trial
+    must be stored one after the other in the file.
+    :param data_address: A string identifying the location of data
+    :param setting: Setting dictionary read as json
+    :param chunksize: number of lines read at a time
+    :param progress: Optional callable taking the fraction of the file read so far, called for every chunk
+    :return: A generator of (trial number, unified dataframe of the trial)
+    """
+    leftover = None
+    size = Path(data_address).stat().st_size
+    with open(data_address, 'rb') as fp:
+        for chunk in pd.read_csv(fp, chunksize=chunksize, **read_arguments(data_address, setting)):
+            if progress is not None:
+                progress(fp.tell() / size if size else 1.0)
+            if 'selected' not in data_address:
+                chunk = unify_data(chunk, setting)
+            if leftover is not None:
+                chunk = pd.concat([leftover, chunk])
+            if chunk.empty:
+                continue
+            last_trial = chunk.trial_no.iloc[-1]
+            complete = (chunk.trial_no != last_trial).values
+            for trial, group in chunk[complete].groupby('trial_no', sort=False):
+                yield trial, group
+            leftover = chunk[~complete]
+
+    if leftover is not None and not leftover.empty:
+        yield leftover.trial_no.iloc[0], leftover
+
 
+def watch_trials(trials, setting, first_trial=None):
+    """
+    The watch_trials method passes on the trials of iter_trials and hands the first one to a callable as a one trial
+    experiment, so that it can be shown before the rest of the file is read
+    :param trials: A generator of (trial number, dataframe of the trial)
+    :param setting: Setting dictionary read as json
+    :param first_trial: Optional callable taking the configuration and setting dictionaries of the one trial experiment
+    :return: A generator of (trial number, dataframe of the trial)
+    """
+    for trial, trial_data in trials:
+        if first_trial is not None:
+            first_trial(set_experiment(trial_data.copy(), setting), setting)
+            first_trial = None
+        yield trial, trial_data
+
+
+def iter_experiments(data_address, setting, chunksize=100000, trials=None):
+    """
+    The iter_experiments method groups the trials yielded by iter_trials into experiments of about chunksize samples
+    :param data_address: A string identifying the location of data
+    :param setting: Setting dictionary read as json
+    :param chunksize: number of samples of every experiment
+    :param trials: Optional generator of (trial number, dataframe of the trial) used instead of iter_trials
+    :return: A generator of experiment configuration dictionaries as returned by set_experiment
+    """
+    pending = []
+    if trials is None:
+        trials = iter_trials(data_address, setting, chunksize)
+    for trial, trial_data in trials:
+        pending.append(trial_data)
+        if sum(len(frame) for frame in pending) >= chunksize:
+            yield set_experiment(pd.concat(pending), setting)
+            pending = []
+    if pending:
+        yield set_experiment(pd.concat(pending), setting)
+
+
+def read_arguments(data_address, setting):
+    """
+    The read_arguments method works out how a data file is parsed from its first line and the setting, so that it is
+    parsed only once. Output files of Pyselector (with 'selected' in their name) are comma separated, the others tab
+    separated, with the column names given by the Header of the setting or by the first line of the file.
+    :param data_address: A string identifying the location of data
+    :param setting: Setting dictionary read as json. Its Header is replaced by the parsed list of column names
+    :return: A dictionary of keyword arguments for pd.read_csv
+    """
     if 'selected' in data_address:
-        data = pd.read_csv(data_address)
+        return {'dtype': column_dtypes(read_header(data_address, ','))}
+
+    fields = read_header(data_address, '\t')
+    if setting['Header']:
+        setting['Header'] = parse_header(setting['Header'])
+        assert (len(setting['Header']) == len(fields)), 'Column numbers do NOT match'
+        for idx, item in enumerate(setting['Header']):
+            if item in ['', [], ' ', 'unused']:
+                setting['Header'][idx] = 'unused' + str(idx)
+        names = setting['Header']
+        try:
+            float(fields[0])
+            skiprows = 0
+        except ValueError:
+            skiprows = 2  # the file has its own header line, which is skipped with the line after it
     else:
-        if setting['Header']:
-            setting['Header'] = eval(setting['Header'])
-            assert (len(setting['Header']) == len(
-                pd.read_csv(data_address, sep='\t').columns)), 'Column numbers do NOT match'
-            for idx, item in enumerate(setting['Header']):
-                if item in ['', [], ' ', 'unused']:
-                    setting['Header'][idx] = 'unused' + str(idx)
-
-            data = pd.read_csv(data_address, sep='\t', names=setting['Header'])
-            try:
-                int(data.iloc[0][0])
-            except ValueError:
-                data = data[2::]
+        names, skiprows = fields, 1
 
-        else:
-            data = pd.read_csv(data_address, sep='\t')
+    usecols = [name for name in names if not name.lower().startswith('unused')]
+    return {'sep': '\t', 'names': names, 'usecols': usecols, 'skiprows': skiprows, 'dtype': column_dtypes(usecols)}
 
-        unify_data(data, setting)  # this is to set the columns and units
 
-    return set_experiment(data, setting), setting
+def read_header(data_address, sep):
+    """
+    The read_header method reads the column names from the first line of a data file, without parsing the file
+    :param data_address: A string identifying the location of data
+    :param sep: The column separator of the file
+    :return: A list of the fields of the first line
+    """
+    with open(data_address, 'r') as fp:
+        return fp.readline().rstrip('\r\n').split(sep)
+
+
+def parse_header(header):
+    """
+    The parse_header method reads the Header of a setting, written either as a python list ("['trial_no', ...]") or
+    as comma separated names. It does not evaluate the text.
+    :param header: The Header string of the setting, or an already parsed list
+    :return: A list of column names
+    """
+    if isinstance(header, list):
+        return header
+    try:
+        return list(ast.literal_eval(header))
+    except (ValueError, SyntaxError):
+        return [name.strip().strip('\'"') for name in header.strip('[]').split(',')]
 
 
-def set_experiment(data, setting):
+def column_dtypes(columns):
+    """
+    The column_dtypes method declares the dtype of the numeric columns Pyselector knows about, so that they are parsed
+    as numbers directly. Other columns are left for pandas to infer.
+    :param columns: list of column names in the file
+    :return: A dictionary of column name to dtype
+    """
+    return {column: 'float64' for column in columns if column.startswith(NUMERIC_COLUMNS)}
+
+
+def set_experiment(data, setting, trial_index=None, memmap_dir=None):
     """
     The set_experiment method handles experiment specific settings such as steps and target locations and groups the
     data by trials.
     :param data: A unified dataframe with appropriate heads and units
     :param setting: A setting dictionary read from file
+    :param trial_index: The trial index of data as returned by index_trials. It is built when not given
+    :param memmap_dir: A string identifying a folder. When given, the experiment is written there as a memmapped layout
+    and the returned experiment reads its trials from disk (see Memmap_Data.open_memmap)
     :return: A experiment specific configuration dictionary
     """
     cfg = {}
     cfg['Trial'] = {}
-    target_locations = np.unique(list(zip(list(data.targetx_cm), list(data.targety_cm))), axis=0)
+    # drop_duplicates hashes the rows, so only the few distinct targets are sorted
+    target_locations = np.unique(data[['targetx_cm', 'targety_cm']].drop_duplicates().values, axis=0)
     cfg['all_targets'] = target_locations
     cfg['output'] = data
+    cfg['trial_index'] = index_trials(data) if trial_index is None else trial_index
+    cfg['trials'] = np.array(list(cfg['trial_index'].keys()))
+    cfg['trial_starts'] = np.array([first_row(rows) for rows in cfg['trial_index'].values()], dtype=int)
 
     if hasattr(data, 'selected') == 0:
         data['accept'] = 0
@@ -63,145 +255,306 @@ def set_experiment(data, setting):
         data['interpolated'] = 0
         data['unsure'] = 0
 
+    if setting.get('Compact'):
+        compact_data(data)
+
     step_start = setting['Segments'][0]
     step_end = setting['Segments'][1]
+    selected_column = data.columns.get_loc('selected')
 
-    for name, group in data.groupby(['trial_no']):  ##looking through trials
-        if hasattr(group, 'accept') and np.unique(group.accept) in [1, -1]:
-            continue
-        if step_start is '':
-            data.loc[group.index, 'selected'] = 1
-        else:
-            step_start = int(step_start)
-            step_end = int(step_end)
-            indices = group[group.step.astype(int).between(int(step_start), int(step_end))].index
-            data.loc[indices, 'selected'] = 1
+    # the samples of the trials not accepted or rejected yet, for all trials at once
+    order, lengths = trial_order(cfg)
+    undecided = np.ones(len(lengths), dtype=bool)
+    if hasattr(data, 'accept'):
+        undecided = ~np.in1d(trial_values(cfg, 'accept'), [1, -1])
+    rows = order[np.repeat(undecided, lengths)]
+    if step_start != '':
+        step = data.step.values[rows].astype(int)
+        rows = rows[(step >= int(step_start)) & (step <= int(step_end))]
+    data.iloc[rows, selected_column] = 1
+
+    if memmap_dir is not None:
+        Memmap_Data.write_memmap([data.iloc[trial_order(cfg)[0]]], memmap_dir, setting)
+        return Memmap_Data.open_memmap(memmap_dir)[0]
 
     return cfg
 
 
+def compact_data(data):
+    """
+    The compact_data method reduces the memory used by an experiment, for the 'Compact' setting. Kinematic columns are
+    stored as float32 when float32 holds all their values exactly (time_ms stays float64 so long sessions keep their
+    millisecond resolution), integer selection flags as int8 and the trial and target columns, which repeat the same few
+    values, as categoricals. The columns keep their names and values, so the gui and the output csv work the same.
+    :param data: A unified dataframe, changed in place
+    """
+    for column in data.columns:
+        if column in FLAG_COLUMNS and data[column].dtype.kind == 'i':
+            data[column] = data[column].astype('int8')
+        elif column.startswith(CATEGORICAL_COLUMNS):
+            data[column] = data[column].astype('category')
+        elif column != 'time_ms' and data[column].dtype == 'float64':
+            values = data[column].values.astype('float32')
+            if np.array_equal(values, data[column].values, equal_nan=True):
+                data[column] = values
+
+
+def index_trials(data):
+    """
+    The index_trials method maps every trial number to the rows holding its samples, so that a trial can be sliced
+    without scanning the whole experiment. Trials stored contiguously are mapped to a slice, the others to an array of
+    row positions.
+    :param data: A unified dataframe with a trial_no column
+    :return: An ordered dictionary of trial number to slice or numpy array, in order of appearance in the data
+    """
+    trial_index = collections.OrderedDict()
+    groups = data.groupby('trial_no', observed=True).indices
+    for trial in sorted(groups, key=lambda key: groups[key][0]):
+        trial_index[trial] = index_entry(groups[trial])
+    return trial_index
+
+
+def build_index(trials, order, lengths):
+    """
+    The build_index method rebuilds a trial index from its flat form, as returned by trial_order
+    :param trials: numpy array of trial numbers
+    :param order: numpy array of row positions grouped by trial
+    :param lengths: numpy array with the number of samples of every trial
+    :return: An ordered dictionary of trial number to slice or numpy array, as returned by index_trials
+    """
+    trial_index = collections.OrderedDict()
+    for trial, rows in zip(trials, np.split(order, np.cumsum(lengths)[:-1])):
+        trial_index[trial] = index_entry(rows)
+    return trial_index
+
+
+def index_entry(rows):
+    """
+    The index_entry method stores the row positions of one trial as a slice when they are contiguous
+    :param rows: numpy array of row positions
+    :return: A slice or the numpy array
+    """
+    if rows[-1] - rows[0] + 1 == len(rows):
+        return slice(int(rows[0]), int(rows[-1]) + 1)
+    return rows
+
+
+def first_row(rows):
+    """
+    The first_row method returns the position of the first sample of a trial
+    :param rows: A slice or numpy array of row positions as stored in the trial index
+    :return: The integer position of the first row
+    """
+    return rows.start if isinstance(rows, slice) else rows[0]
+
+
+def positions(rows):
+    """
+    The positions method expands a trial index entry into an array of row positions
+    :param rows: A slice or numpy array of row positions as stored in the trial index
+    :return: A numpy array of row positions
+    """
+    if isinstance(rows, slice):
+        return np.arange(rows.start, rows.stop)
+    return rows
+
+
+def trial_order(experiment):
+    """
+    The trial_order method lists the rows of all trials one trial after the other, as used by the batched computations
+    :param experiment: An experiment configuration dictionary as returned by set_experiment
+    :return: A numpy array of row positions grouped by trial and a numpy array with the number of samples of each trial
+    """
+    rows = [positions(rows) for rows in experiment['trial_index'].values()]
+    return np.concatenate(rows), np.array([len(trial_rows) for trial_rows in rows])
+
+
+def trial_frame(experiment, trial):
+    """
+    The trial_frame method returns a copy of the samples of one trial using the trial index of the experiment
+    :param experiment: An experiment configuration dictionary as returned by set_experiment
+    :param trial: the trial number (NOT INDEX)
+    :return: A pandas dataframe holding the samples of the trial, with the labels of the output dataframe
+    """
+    if experiment['output'] is None:
+        return Memmap_Data.memmap_frame(experiment['columns'], experiment['trial_index'][trial])
+    return experiment['output'].iloc[experiment['trial_index'][trial]].copy()
+
+
+def store_trial(experiment, trial, trial_data):
+    """
+    The store_trial method writes the columns of a trial dataframe back into the output dataframe of the experiment.
+    Only the rows of the trial are touched.
+    :param experiment: An experiment configuration dictionary as returned by set_experiment
+    :param trial: the trial number (NOT INDEX)
+    :param trial_data: A pandas dataframe for the trial as returned by trial_frame
+    """
+    output = experiment['output']
+    rows = experiment['trial_index'][trial]
+    if output is None:
+        for column in trial_data.columns:
+            if column in experiment['columns']:
+                experiment['columns'][column][rows] = trial_data[column].values
+        return
+    for column in trial_data.columns:
+        if column in output.columns:  # one column at a time, so that each keeps its own dtype
+            output.iloc[rows, output.columns.get_loc(column)] = trial_data[column].values
+
+
+def trial_values(experiment, column):
+    """
+    The trial_values method reads a trial wide column (such as accept or unsure) from the first sample of every trial
+    :param experiment: An experiment configuration dictionary as returned by set_experiment
+    :param column: the name of the column
+    :return: A numpy array with one value per trial, in the order of experiment['trials']
+    """
+    return column_values(experiment, column)[experiment['trial_starts']]
+
+
+def column_values(experiment, column):
+    """
+    The column_values method returns all the samples of one column of an experiment
+    :param experiment: An experiment configuration dictionary as returned by set_experiment
+    :param column: the name of the column
+    :return: A numpy array (a memmap for memmapped experiments)
+    """
+    if experiment['output'] is None:
+        return experiment['columns'][column]
+    return np.asarray(experiment['output'][column])
+
+
+def set_values(experiment, column, rows, value):
+    """
+    The set_values method sets some samples of one column of an experiment
+    :param experiment: An experiment configuration dictionary as returned by set_experiment
+    :param column: the name of the column
+    :param rows: A slice or numpy array of row positions
+    :param value: The value or numpy array of values to set
+    """
+    if experiment['output'] is None:
+        experiment['columns'][column][rows] = value
+    else:
+        experiment['output'].iloc[rows, experiment['output'].columns.get_loc(column)] = value
+
+
+def write_output(experiment, output_address, chunksize=100000, append=False):
+    """
+    The write_output method writes the output csv file of an experiment. Memmapped experiments are written chunksize
+    rows at a time. float32 columns are written as float64, see output_frame.
+    :param experiment: An experiment configuration dictionary as returned by set_experiment
+    :param output_address: A string identifying the output csv file
+    :param chunksize: number of rows written at a time for memmapped experiments
+    :param append: True to append the rows to the file, without its header, as run_stream does
+    """
+    if experiment['output'] is not None:
+        output_frame(experiment['output']).to_csv(output_address, index=False, header=not append,
+                                                  mode='a' if append else 'w')
+        return
+
+    length = len(next(iter(experiment['columns'].values()))) if experiment['columns'] else 0
+    for start in range(0, max(length, 1), chunksize):
+        frame = Memmap_Data.memmap_frame(experiment['columns'], slice(start, min(start + chunksize, length)))
+        first = start == 0 and not append
+        output_frame(frame).to_csv(output_address, index=False, header=first, mode='w' if first else 'a')
+
+
+def output_path(data_address):
+    """
+    The output_path method creates the name of the selected output file for a data file, as used by both the gui and
+    the batch. A file whose name already holds 'selected' is written in place.
+    :param data_address: A string identifying the location of data
+    :return: A string identifying the output csv file next to the data
+    """
+    experiment_path = os.path.abspath(os.path.join(data_address, os.pardir))
+    experiment_name = os.path.splitext(os.path.basename(data_address))[0]
+    if 'selected' in experiment_name:
+        return os.path.join(experiment_path, experiment_name + '.csv')
+    return os.path.join(experiment_path, experiment_name + '_selected.csv')
+
+
+def output_frame(frame):
+    """
+    The output_frame method upcasts the float32 columns of a dataframe (see compact_data) to float64 before it is
+    written, so that their values are printed as the ones of an experiment that is not compact
+    :param frame: A pandas dataframe
+    :return: The dataframe, or a copy of it with float64 columns
+    """
+    float32_columns = [column for column in frame.columns if frame[column].dtype == 'float32']
+    if not float32_columns:
+        return frame
+    return frame.astype(dict.fromkeys(float32_columns, 'float64'))
+
+
+# The columns unify_data converts: the prefixes of the column names, the unified column name and the index of the
+# 'Display Origin' coordinate subtracted from pixel values
+UNIFIED_COLUMNS = [
+    (('time',), 'time_ms', None),
+    (('cursorx',), 'cursorx_cm', 0),
+    (('cursory',), 'cursory_cm', 1),
+    (('penx', 'robotx', 'mousex', 'handx'), 'handx_cm', 0),
+    (('peny', 'roboty', 'mousey', 'handy'), 'handy_cm', 1),
+    (('targetx',), 'targetx_cm', 0),
+    (('targety',), 'targety_cm', 1),
+]
+
+# The columns parsed as numbers: the unified columns, the trial information and the selection flags
+NUMERIC_COLUMNS = tuple(prefix for prefixes, name, origin in UNIFIED_COLUMNS for prefix in prefixes) + (
+    'trial_no', 'targetangle', 'rotation', 'home', 'step', 'accept', 'max_velocity', 'selected', 'interpolated',
+    'unsure')
+
+# The columns stored as int8 and as categoricals by compact_data
+FLAG_COLUMNS = ('accept', 'max_velocity', 'selected', 'interpolated', 'unsure')
+CATEGORICAL_COLUMNS = ('trial_no', 'targetx', 'targety', 'targetangle')
+
+# The scale from each unit to the unified units (ms for time, cm for positions). Pixels are scaled by PX_CM_Ratio
+TIME_SCALES = {'ms': 1, 's': 1000, 'm': 60000}
+POSITION_SCALES = {'cm': 1, 'm': 100, 'px': None}
+
+
 def unify_data(data, setting):
     """
-    The unify_data method converts all data to Pyselector appropriate units
+    The unify_data method converts all data to Pyselector appropriate units. Every column is converted in one
+    vectorized step as described by column_conversion and the unified dataframe is built once.
     :param data: Pandas dataframe read from the specified file
     :param setting: Setting dictionary read as json
-    :return: Unify data does not return anything as the data dataframe is passed by reference
+    :return: The unified dataframe, rows with Nan's are removed
     """
-    data.dropna(
-        inplace=True)  # remove any rows or columns with Nan's (maybe add a special pop up for this? some notice)
+    data = data.dropna()  # remove any rows with Nan's (maybe add a special pop up for this? some notice)
     if setting['Display Origin'] == ['', '', '']:
         setting['Display Origin'] = [528, 395, 'px']
 
-    if setting['Header'] and ~ len(setting['Header']) == len(data.columns):
-        assert ('Header columns and data columns do not match')
+    unified = collections.OrderedDict()
+    for key in data.columns:
+        name, scale, offset = column_conversion(key, setting)
+        if scale is None:
+            unified[name] = data[key].values
+        else:
+            unified[name] = (data[key].values.astype('float', copy=False) - offset) * scale
+
+    if 'step' in unified:
+        unified['step'] = unified['step'].astype('int')
 
-    else:
-        setting_headers = data.columns
-        for key in setting_headers:
-            if key.startswith('time'):
-                unit = key.split('_')[1]
-                if unit != 'ms':
-                    if unit == 's':
-                        data.insert(data.columns.get_loc['time_s'], 'time_ms', data.time_s.astype('float') * 1000)
-                        data.drop('time_s', axis=1, inplace=True)
-                    elif unit == 'm':
-                        data.insert(data.columns.get_loc['time_m'], 'time_ms', data.time_m.astype('float') / 60000)
-                        data.drop('time_m', axis=1, inplace=True)
-                    else:
-                        assert ('I don''t know how to handle this unit for time:  ' + unit)
-                if unit == 'ms':
-                    data['time_ms'] = data.time_ms.astype('float')
-
-            if key.startswith('cursorx'):
-                unit = key.split('_')[1]
-                if unit == 'px':
-                    data.insert(data.columns.get_loc(key), 'cursorx_cm',
-                                (data.cursorx_px.astype('float') - setting['Display Origin'][0]) * float(
-                                    setting['PX_CM_Ratio']))
-                    data.drop(key, axis=1, inplace=True)
-                elif unit == 'cm':
-                    keyloc = data.columns.get_loc(key)
-                    mydata = data[key].astype('float')
-                    data.drop(key, axis=1, inplace=True)
-                    data.insert(keyloc, 'cursorx_cm', mydata)
-
-            if key.startswith('cursory'):
-                unit = key.split('_')[1]
-                if unit == 'px':
-                    data.insert(data.columns.get_loc(key), 'cursory_cm',
-                                (data.cursory_px.astype('float') - setting['Display Origin'][1]) * float(
-                                    setting['PX_CM_Ratio']))
-                    data.drop('cursory_px', axis=1, inplace=True)
-                elif unit == 'cm':
-                    keyloc = data.columns.get_loc(key)
-                    mydata = data[key].astype('float')
-                    data.drop(key, axis=1, inplace=True)
-                    data.insert(keyloc, 'cursory_cm', mydata)
-
-            if key.startswith(('penx', 'robotx', 'mousex', 'handx')):
-                label, unit = key.split('_')
-                if unit == 'm':
-                    data.insert(data.columns.get_loc(key), 'handx_cm',
-                                data[key].astype('float') * 100)
-                    data.drop(key, axis=1, inplace=True)
-                elif unit == 'px':
-                    ## ("\"is not  division , tells python to read next line)
-                    data.insert(data.columns.get_loc(key), 'handx_cm',
-                                (data.cursory_px.astype('float') - setting['Display Origin'][1]) * float(
-                                    setting['PX_CM_Ratio']))
-                    data['handx_cm'] = (data[key].astype('float') - setting['Display Origin'][1]) \
-                                       * float(setting['PX_CM_Ratio'])
-                    data.drop(key, axis=1, inplace=True)
-                elif unit == 'cm':
-                    keyloc = data.columns.get_loc(key)
-                    mydata = data[key].astype('float')
-                    data.drop(key, axis=1, inplace=True)
-                    data.insert(keyloc, 'handx_cm', mydata)
-
-            if key.startswith(('peny', 'roboty', 'mousey', 'handy')):
-                if unit == 'm':
-                    data.insert(data.columns.get_loc(key), 'handy_cm',
-                                data[key].astype('float') * 100)
-                    data.drop(key, axis=1, inplace=True)
-                elif unit == 'px':
-                    data.insert(data.columns.get_loc(key), 'handy_cm',
-                                (data[key].astype('float') - setting['Display Origin'][1])
-                                * float(setting['PX_CM_Ratio']))
-                    data.drop(key, axis=1, inplace=True)
-                elif unit == 'cm':
-                    keyloc = data.columns.get_loc(key)
-                    mydata = data[key].astype('float')
-                    data.drop(key, axis=1, inplace=True)
-                    data.insert(keyloc, 'handy_cm', mydata)
-
-            if key.startswith('targetx'):
-                unit = key.split('_')[1]
-                if unit == 'px':
-                    data.insert(data.columns.get_loc(key), 'targetx_cm',
-                                (data.targetx_px.astype('float') - setting['Display Origin'][0]) * float(
-                                    setting['PX_CM_Ratio']))
-                    data.drop('targetx_px', axis=1, inplace=True)
-                elif unit == 'm':
-                    data.insert(data.columns.get_loc(key), 'targetx_cm',
-                                data[key].astype('float') * 100)
-                    data.drop(key, axis=1, inplace=True)
-                elif unit == 'cm':
-                    data[key] = data[key].astype('float')
-
-            if key.startswith('targety'):
-                unit = key.split('_')[1]
-                if unit == 'px':
-                    data.insert(data.columns.get_loc(key), 'targety_cm',
-                                (data.targety_px.astype('float') - setting['Display Origin'][1]) * float(
-                                    setting['PX_CM_Ratio']))
-                    data.drop('targety_px', axis=1, inplace=True)
-
-                elif unit == 'm':
-                    data.insert(data.columns.get_loc(key), 'targety_cm',
-                                data[key].astype('float') * 100)
-                    data.drop(key, axis=1, inplace=True)
-                elif unit == 'cm':
-                    data[key] = data[key].astype('float')
-
-            if key.startswith('step'):
-                data[key] = data[key].astype('int')
+    return pd.DataFrame(unified, index=data.index)
+
+
+def column_conversion(key, setting):
+    """
+    The column_conversion method looks up how a column is converted to Pyselector units
+    :param key: The column name, as <name>_<unit>
+    :param setting: Setting dictionary read as json
+    :return: The unified column name, the scale and the offset subtracted before scaling. The scale is None for columns
+    that are kept as they are.
+    """
+    if '_' not in key:
+        return key, None, 0
+    unit = key.rsplit('_', 1)[1]
+    for prefixes, name, origin in UNIFIED_COLUMNS:
+        if not key.startswith(prefixes):
+            continue
+        scales = TIME_SCALES if origin is None else POSITION_SCALES
+        if unit not in scales:
+            raise ValueError('I don\'t know how to handle this unit for ' + key + ': ' + unit)
+        if unit == 'px':
+            return name, float(setting['PX_CM_Ratio']), float(setting['Display Origin'][origin])
+        return name, float(scales[unit]), 0
+    return key, None, 0
@@ -0,0 +1,105 @@
+import collections
+
+import numpy as np
+import pandas as pd
+
+from database.Read_Data import column_values, trial_order
+from database.Select_Data import first_index, session_profile
+
+# The 'Scoring' block of a setting and its defaults. A trial fails a check when its speed profile has another peak of
+# at least Peak Ratio of its highest peak, when that peak is within Edge Fraction of the start or end of the trial,
+# when p1 to p2 is shorter than Min Movement Time (ms), when two samples are more than Gap Factor times the median
+# sample interval apart, or when the hand never comes closer than Max Target Distance (cm) to the target. Trials whose
+# confidence is below Min Confidence are flagged for review.
+SCORING = {'Peak Ratio': 0.5, 'Edge Fraction': 0.05, 'Min Movement Time': 150, 'Gap Factor': 3,
+           'Max Target Distance': 3.0, 'Min Confidence': 0.75}
+
+# How much failing a check lowers the confidence of a trial, which starts at 1
+CHECK_WEIGHTS = collections.OrderedDict([('multiple_peaks', 0.3), ('edge_peak', 0.5), ('short_movement', 0.5),
+                                         ('sampling_gap', 0.3), ('off_target', 0.4)])
+SCORE_COLUMNS = ['trial_no'] + list(CHECK_WEIGHTS) + ['confidence', 'flagged']
+
+
+def scoring(setting=None):
+    """
+    The scoring method reads the 'Scoring' block of a setting, filling in the defaults of SCORING
+    :param setting: Setting dictionary, or None for the defaults
+    :return: A scoring configuration dictionary
+    """
+    config = dict(SCORING)
+    if setting:
+        config.update(setting.get('Scoring') or {})
+    return config
+
+
+def score_trials(experiment, setting=None, profile=None):
+    """
+    The score_trials method checks the automatic selection of every trial of an experiment at once and gives every
+    trial a confidence, so that a reviewer only needs to look at the flagged ones. The checks are the ones of SCORING,
+    on the resampled speeds and the p1, p2 and max velocity of session_profile, the selection the GUI shows and the
+    batch marks.
+    :param experiment: An experiment configuration dictionary as returned by set_data
+    :param setting: Setting dictionary, for its 'Resampling', 'Detection' and 'Scoring' blocks
+    :param profile: The session_profile of the experiment, computed when not given
+    :return: A pandas dataframe with one row per trial, in the order of experiment['trials'], and SCORE_COLUMNS: one
+    boolean column per check, the confidence from 0 to 1 and whether the trial is flagged
+    """
+    if profile is None:
+        profile = session_profile(experiment, setting)
+    config = scoring(setting)
+    speed = profile['speed']
+    rows = len(speed)
+    npoints = profile['points']
+    peak = first_index(profile['time'] == profile['max_velocity'][:, None], np.nanargmax(speed, axis=1))
+    peak_speed = profile['peak_speed']
+
+    # peaks are samples higher than the one before and at least as high as the one after
+    local_peak = np.zeros(speed.shape, dtype=bool)
+    local_peak[:, 1:-1] = (speed[:, 1:-1] > speed[:, :-2]) & (speed[:, 1:-1] >= speed[:, 2:])
+    high_peaks = (local_peak & (speed >= float(config['Peak Ratio']) * peak_speed[:, None])).sum(axis=1)
+    edge = np.ceil(float(config['Edge Fraction']) * (npoints - 1)).astype(int)
+
+    order, lengths = trial_order(experiment)
+    starts = np.cumsum(lengths) - lengths
+    time_ms = column_values(experiment, 'time_ms')[order].astype('float')
+    interval = np.zeros(len(order))
+    interval[1:] = np.diff(time_ms)
+    interval[starts] = 0
+    sampling = np.median(interval[interval > 0]) if (interval > 0).any() else 0
+    largest_interval = np.maximum.reduceat(interval, starts)
+
+    checks = collections.OrderedDict([
+        ('multiple_peaks', high_peaks > 1),
+        ('edge_peak', (peak <= edge) | (peak >= npoints - 1 - edge)),
+        ('short_movement', profile['p2'] - profile['p1'] < float(config['Min Movement Time'])),
+        ('sampling_gap', largest_interval > float(config['Gap Factor']) * sampling),
+        ('off_target', target_distance(experiment, order, starts) > float(config['Max Target Distance']))])
+
+    confidence = np.ones(rows)
+    for check, failed in checks.items():
+        confidence -= CHECK_WEIGHTS[check] * failed
+    confidence = np.clip(confidence, 0, 1)
+
+    scores = pd.DataFrame(checks, columns=list(CHECK_WEIGHTS))
+    scores.insert(0, 'trial_no', experiment['trials'])
+    scores['confidence'] = confidence
+    scores['flagged'] = confidence < float(config['Min Confidence'])
+    return scores
+
+
+def target_distance(experiment, order, starts):
+    """
+    The target_distance method measures how close the hand comes to the target in every trial, for all trials at once
+    :param experiment: An experiment configuration dictionary as returned by set_data
+    :param order: the trial ordered rows, as returned by trial_order
+    :param starts: the position of the first sample of every trial in order
+    :return: numpy array of distances in cm, 0 when the data has no target position
+    """
+    try:
+        targetx = column_values(experiment, 'targetx_cm')[order].astype('float')
+        targety = column_values(experiment, 'targety_cm')[order].astype('float')
+    except KeyError:
+        return np.zeros(len(starts))
+    handx = column_values(experiment, 'handx_cm')[order].astype('float')
+    handy = column_values(experiment, 'handy_cm')[order].astype('float')
+    return np.minimum.reduceat(np.hypot(handx - targetx, handy - targety), starts)
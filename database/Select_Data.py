@@ -0,0 +1,549 @@
+import functools
+
+import numpy as np
+from scipy import signal
+
+from database.Read_Data import trial_order, column_values
+
+# The 'Resampling' block of a setting and its defaults, which keep the original velocity profile: 50 points per trial
+# and a first order butterworth filter applied with filtfilt. Rate is the resampled rate in Hz (the number of Points
+# is used when it is empty). Cutoff is the cut-off of the filter in Hz; when it is empty the normalized cut-off is 3
+# divided by the mean sample interval in ms. Window and Polyorder are used by the 'savgol' Method. Padding is how
+# filtfilt and sosfiltfilt extend the edges of a trial ('odd', 'even', 'constant' or 'none') and Padlen the number of
+# points added, by default 3 times the number of filter taps and at most one less than the points of the trial.
+RESAMPLING = {'Rate': None, 'Points': 50, 'Method': 'filtfilt', 'Order': 1, 'Cutoff': None, 'Window': 7,
+              'Polyorder': 3, 'Padding': 'odd', 'Padlen': None}
+FILTER_METHODS = ('filtfilt', 'sosfiltfilt', 'savgol')
+PADDINGS = ('odd', 'even', 'constant', 'none')
+
+# The 'Detection' block of a setting and its defaults, which keep the original selection: the movement starts at the
+# first sample above 10% of the peak speed and ends at the first sample after the peak back at or below it. Method is
+# one of DETECTORS. Percent is used by 'percent' and 'sustained', Threshold (cm/s) by 'threshold', Acceleration
+# (cm/s^2) by 'acceleration' and Samples, the number of consecutive samples that must pass the threshold, by
+# 'sustained'.
+DETECTION = {'Method': 'percent', 'Percent': 10, 'Threshold': 5.0, 'Acceleration': 50.0, 'Samples': 3}
+
+
+def velocityupdate(data):
+    """
+    The velocityupdate method calculates the max velocity position based on the interpolated data
+    :param data: A Pandas dataframe for one trial.  The dataframe must also hold the interpolated information as an attribute
+    :return: Returns a max_position list
+    """
+    interpolated_speed, interpolated_time = data.Interpolated
+    selection = slice(np.searchsorted(interpolated_time, data.selectedp1, side='right'),
+                      np.searchsorted(interpolated_time, data.selectedp2, side='left'))
+    interpolated_speed, interpolated_time = interpolated_speed[selection], interpolated_time[selection]
+    data.selectedmaxvelocity = interpolated_time[interpolated_speed.argmax()]
+    maxspeedidx = time_index(data.time_ms.values, data.selectedmaxvelocity)
+    max_position = [data.handx_cm.iloc[maxspeedidx], data.handy_cm.iloc[maxspeedidx]]
+    return max_position
+
+
+def velocityselect(data, setting=None):
+    """
+    The velocityselect method calculates the interpolated data of one trial and sets p1, p2, max velocity and the
+    selected samples between p1 and p2. It runs profile_trials on the trial alone, the same selection session_profile
+    runs on all trials at once for the batch. It does not create any figure, so it can be used without a display.
+    :param data: Pandas dataframe with information about about one trial
+    :param setting: Setting dictionary, for its 'Resampling' (see RESAMPLING) and 'Detection' (see DETECTION) blocks
+    :return: Returns a max_position list.
+    """
+    if 'handx_cm' not in data.keys():
+        raise Exception('There is no hand data, please check your settings')
+
+    time_ms = data['time_ms'].values.astype('float')
+    profile = profile_trials(time_ms, data.handx_cm.values.astype('float'), data.handy_cm.values.astype('float'),
+                             np.array([len(data)]), setting)
+    # adding it to our trialdata object in  gui.mainwindow
+    npoints = profile['points'][0]
+    data.Interpolated = [profile['speed'][0, :npoints],
+                         profile['time'][0, :npoints]]  # we can treat data as-if it was passed by reference here
+    data.RealSpeed = calculate_speeds(data.handx_cm.astype('float'), data.handy_cm.astype('float'), data['time_ms'])
+
+    data.selectedp1, data.selectedp2 = profile['p1'][0], profile['p2'][0]
+    data.selectedmaxvelocity = profile['max_velocity'][0]
+    data['selected'] = ((time_ms >= data.selectedp1) & (time_ms <= data.selectedp2)).astype(int)
+    maxspeedidx = profile['max_sample'][0]
+    max_position = [data.handx_cm.iloc[maxspeedidx], data.handy_cm.iloc[maxspeedidx]]
+    return max_position
+
+
+def mark_selection(data):
+    """
+    The mark_selection method sets the selected samples between p1 and p2 and the max velocity sample of one trial, as
+    accepted/rejected by the user or by the batch selection. The other samples are cleared, so the marks only depend on
+    p1, p2 and max velocity and not on what the trial held before.
+    :param data: Pandas dataframe for one trial with selectedp1, selectedp2 and selectedmaxvelocity set
+    """
+    time_ms = data.time_ms.values
+    maxvel_idx = time_index(time_ms, data.selectedmaxvelocity)
+    p1_idx = time_index(time_ms, data.selectedp1)
+    p2_idx = time_index(time_ms, data.selectedp2) + 1
+    for column in ('selected', 'max_velocity'):
+        data[column] = np.zeros(len(data), dtype=data[column].dtype)
+    data.iloc[p1_idx:p2_idx, data.columns.get_loc('selected')] = 1
+    data.iloc[maxvel_idx, data.columns.get_loc('max_velocity')] = 1
+
+
+def session_profile(experiment, setting=None, npoints=None):
+    """
+    The session_profile method computes the velocity profile and the selection of every trial of an experiment at once
+    with profile_trials, which velocityselect runs on a single trial, so the batch selects what the GUI selects
+    :param experiment: An experiment configuration dictionary as returned by set_data
+    :param setting: Setting dictionary, for its 'Resampling' (see RESAMPLING) and 'Detection' (see DETECTION) blocks
+    :param npoints: number of resampled points of every trial. By default the Points of the setting, or with a Rate
+    enough points to reach that rate on each trial
+    :return: The dictionary of profile_trials, in the order of experiment['trials'], where 'max_sample' is a position in
+    the rows of trial_order and 'row' maps a trial number to its row.
+    """
+    try:
+        handx = column_values(experiment, 'handx_cm')
+        handy = column_values(experiment, 'handy_cm')
+    except KeyError:
+        raise Exception('There is no hand data, please check your settings')
+
+    order, lengths = trial_order(experiment)
+    time_ms = column_values(experiment, 'time_ms')[order].astype('float')
+    profile = profile_trials(time_ms, handx[order].astype('float'), handy[order].astype('float'), lengths, setting,
+                             npoints)
+    profile['trials'] = experiment['trials']
+    profile['row'] = dict(zip(experiment['trials'], np.arange(len(lengths))))
+    return profile
+
+
+def profile_trials(time_ms, handx, handy, lengths, setting=None, npoints=None):
+    """
+    The profile_trials method computes the velocity profiles of many trials at once and selects their movement. Each
+    trial is resampled onto its own number of points (see resample_points), and the trials with the same number of
+    points are profiled together by resample_trials, so every trial is resampled, filtered and selected exactly as it
+    would be on its own.
+    :param time_ms: numpy array of the sample times, grouped by trial as ordered by trial_order
+    :param handx: numpy array of the hand x positions of the samples
+    :param handy: numpy array of the hand y positions of the samples
+    :param lengths: numpy array with the number of samples of each trial
+    :param setting: Setting dictionary, for its 'Resampling' (see RESAMPLING) and 'Detection' (see DETECTION) blocks
+    :param npoints: number of resampled points of every trial, instead of the ones of the setting
+    :return: A dictionary of columnar numpy arrays with one row per trial. 'time' and 'speed' hold the resampled
+    profiles, padded with nan after the 'points' of the trial, 'p1', 'p2', 'max_velocity' and 'peak_speed' one value
+    per trial, 'max_sample' the position in time_ms of the max velocity sample and 'valid' whether the trial has a
+    selection.
+    """
+    ends = np.cumsum(lengths)
+    config, detector = resampling(setting), detection(setting)
+    if npoints is None:
+        points = resample_points(config, time_ms[ends - 1] - time_ms[ends - lengths])
+    else:
+        points = np.full(len(lengths), npoints)
+
+    profile = {'time': np.full((len(lengths), points.max()), np.nan),
+               'speed': np.full((len(lengths), points.max()), np.nan),
+               'points': points,
+               'p1': np.zeros(len(lengths)),
+               'p2': np.zeros(len(lengths)),
+               'max_velocity': np.zeros(len(lengths)),
+               'max_sample': np.zeros(len(lengths), dtype=int),
+               'peak_speed': np.zeros(len(lengths)),
+               'valid': np.zeros(len(lengths), dtype=bool)}
+    for group_points in np.unique(points):
+        group = points == group_points
+        samples = np.repeat(group, lengths)
+        group_profile = resample_trials(time_ms[samples], handx[samples], handy[samples], lengths[group], config,
+                                        detector, group_points)
+        group_profile['max_sample'] = np.flatnonzero(samples)[group_profile['max_sample']]
+        for key, values in group_profile.items():
+            if values.ndim == 2:
+                profile[key][group, :group_points] = values
+            else:
+                profile[key][group] = values
+    return profile
+
+
+def resample_trials(time_ms, handx, handy, lengths, config, detector, npoints):
+    """
+    The resample_trials method profiles trials that are resampled onto the same number of points. Each trial is
+    resampled onto npoints equally spaced samples between its first and last sample, so all trials form one 2-D array
+    that is filtered and differentiated along axis=1. Trials sharing the same normalized cut-off share one filter
+    design. p1 and p2 are found by the detector (see movement_bounds), p1 at the first sample after the resampled onset
+    and p2 at the first sample at or after the resampled offset, and the selection of the percent detector is then
+    refined by refine_selection.
+    :param time_ms: numpy array of the sample times, grouped by trial as ordered by trial_order
+    :param handx: numpy array of the hand x positions of the samples
+    :param handy: numpy array of the hand y positions of the samples
+    :param lengths: numpy array with the number of samples of each trial
+    :param config: A resampling configuration dictionary as returned by resampling
+    :param detector: A detection configuration dictionary as returned by detection
+    :param npoints: number of resampled points per trial
+    :return: A dictionary of columnar numpy arrays with one row per trial, as profile_trials returns without 'points'
+    """
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    first, last = time_ms[starts], time_ms[ends - 1]
+
+    # one np.interp call resamples all trials on the session time
+    shifted_time, offsets = session_time(time_ms, lengths)
+    interpolated_time = first[:, None] + (last - first)[:, None] * np.linspace(0, 1, npoints)[None, :]
+    shifted_grid = interpolated_time + offsets[:, None]
+    xpoly = np.interp(shifted_grid.ravel(), shifted_time, handx).reshape(shifted_grid.shape)
+    ypoly = np.interp(shifted_grid.ravel(), shifted_time, handy).reshape(shifted_grid.shape)
+
+    cutoffs = cutoff_frequency(config, (last - first) / np.maximum(lengths - 1, 1), (last - first) / (npoints - 1))
+    designs, design_rows = np.unique(np.round(cutoffs, 6), return_inverse=True)
+    for design_idx, cutoff in enumerate(designs):
+        selection = design_rows == design_idx
+        xpoly[selection] = smooth(xpoly[selection], config, cutoff)
+        ypoly[selection] = smooth(ypoly[selection], config, cutoff)
+
+    interpolated_speed = np.zeros(interpolated_time.shape)
+    interpolated_speed[:, 1:] = calculate_speeds(xpoly, ypoly, interpolated_time)
+
+    trial_rows = np.arange(len(lengths))
+    maxspeedidx = interpolated_speed.argmax(axis=1)
+    p1idx, p2idx = movement_bounds(interpolated_speed, interpolated_time, maxspeedidx, detector)
+    p1 = time_ms[sample_index(time_ms, lengths, interpolated_time[trial_rows, p1idx], side='right')]
+    p2 = time_ms[sample_index(time_ms, lengths, interpolated_time[trial_rows, p2idx])]
+    max_velocity = interpolated_time[trial_rows, maxspeedidx]
+    peak_speed = interpolated_speed[trial_rows, maxspeedidx]
+    valid = np.ones(len(lengths), dtype=bool)
+    if detector['Method'] == 'percent':
+        p1, p2, max_velocity, peak_speed, valid = refine_selection(interpolated_speed, interpolated_time, p1, p2,
+                                                                   time_ms, lengths, detector)
+
+    return {'time': interpolated_time,
+            'speed': interpolated_speed,
+            'p1': p1,
+            'p2': p2,
+            'max_velocity': max_velocity,
+            'max_sample': sample_index(time_ms, lengths, max_velocity),
+            'peak_speed': peak_speed,
+            'valid': valid}
+
+
+def refine_selection(speed, time, p1, p2, time_ms, lengths, detector):
+    """
+    The refine_selection method is the second selection of the percent detector, for all trials at once. The max
+    velocity is the fastest resampled point strictly between p1 and p2. p1 moves to the first of those points faster
+    than Percent of the max velocity time, or to the point before the max velocity when that is the fastest, and p2 to
+    the first point after the max velocity slower than Percent of its speed, or to the point before the last when the
+    next point already is or none is. Both then move to the first sample after their point.
+    :param speed: 2-D numpy array of resampled speeds, one row per trial
+    :param time: 2-D numpy array of the resampled times of speed
+    :param p1: numpy array of the time of the first selected sample of every trial
+    :param p2: numpy array of the time of the last selected sample of every trial
+    :param time_ms: numpy array of the sample times, grouped by trial as ordered by trial_order
+    :param lengths: numpy array with the number of samples of each trial
+    :param detector: A detection configuration dictionary as returned by detection
+    :return: numpy arrays of p1, p2, the max velocity time and speed and whether the trial has resampled points between
+    p1 and p2. The trials without any keep p1, p2 and the max velocity of the first selection.
+    """
+    trial_rows = np.arange(len(lengths))
+    npoints = speed.shape[1]
+    fraction = float(detector['Percent']) / 100
+    window = (time > p1[:, None]) & (time < p2[:, None])
+    valid = window.any(axis=1)
+
+    maxspeed = np.where(window, speed, -np.inf).max(axis=1)
+    maxspeedidx = first_index(speed == maxspeed[:, None], speed.argmax(axis=1))
+    max_velocity = time[trial_rows, maxspeedidx]
+
+    above = window & (speed > (max_velocity * fraction)[:, None])
+    p1_speed = speed[trial_rows, first_index(above, first_index(window, 0))]
+    p1_idx = np.where(p1_speed == maxspeed, maxspeedidx - 1, first_index(speed == p1_speed[:, None], 0)) % npoints
+
+    slower = (np.arange(npoints)[None, :] > maxspeedidx[:, None]) & (speed < (maxspeed * fraction)[:, None])
+    p2_idx = first_index(slower, npoints - 2)
+    p2_idx = np.where(p2_idx == maxspeedidx + 1, npoints - 2, p2_idx)
+
+    first_peak = speed.argmax(axis=1)
+    return (np.where(valid, time_ms[sample_index(time_ms, lengths, time[trial_rows, p1_idx], side='right')], p1),
+            np.where(valid, time_ms[sample_index(time_ms, lengths, time[trial_rows, p2_idx], side='right')], p2),
+            np.where(valid, max_velocity, time[trial_rows, first_peak]),
+            np.where(valid, maxspeed, speed[trial_rows, first_peak]),
+            valid)
+
+
+def resampling(setting=None):
+    """
+    The resampling method reads the 'Resampling' block of a setting, filling in the defaults of RESAMPLING
+    :param setting: Setting dictionary, or None for the defaults
+    :return: A resampling configuration dictionary
+    """
+    config = dict(RESAMPLING)
+    if setting:
+        config.update(setting.get('Resampling') or {})
+    if config['Method'] not in FILTER_METHODS:
+        raise ValueError('Unknown filter method ' + str(config['Method']) + ', use one of ' + ', '.join(FILTER_METHODS))
+    if (config['Padding'] or 'none') not in PADDINGS:
+        raise ValueError('Unknown padding ' + str(config['Padding']) + ', use one of ' + ', '.join(PADDINGS))
+    return config
+
+
+def resample_points(config, duration):
+    """
+    The resample_points method works out the number of points trials are resampled onto
+    :param config: A resampling configuration dictionary as returned by resampling
+    :param duration: numpy array of the lengths of the trials in ms
+    :return: numpy array of the number of points of every trial, at least 2
+    """
+    duration = np.asarray(duration, dtype=float)
+    if not config['Rate']:
+        return np.maximum(np.full(duration.shape, int(config['Points'])), 2)
+    return np.maximum(np.ceil(duration * float(config['Rate']) / 1000.0).astype(int) + 1, 2)
+
+
+def cutoff_frequency(config, sample_interval, resampled_interval):
+    """
+    The cutoff_frequency method works out the normalized cut-off (the fraction of the nyquist frequency) of the
+    low-pass filter of a resampled trial. It is kept below 1, as butter requires.
+    :param config: A resampling configuration dictionary as returned by resampling
+    :param sample_interval: the mean sample interval of the trial in ms, or a numpy array of them
+    :param resampled_interval: the interval of the resampled points in ms, or a numpy array of them
+    :return: the normalized cut-off, or a numpy array of them
+    """
+    if config['Cutoff'] in (None, ''):
+        cutoff = 3 / np.asarray(sample_interval, dtype=float)
+    else:
+        cutoff = float(config['Cutoff']) * 2 * np.asarray(resampled_interval, dtype=float) / 1000.0
+    return np.minimum(cutoff, 0.99)
+
+
+@functools.lru_cache(maxsize=256)
+def filter_design(method, order, cutoff):
+    """
+    The filter_design method designs the low-pass butterworth filter of a method, once for every order and
+    normalized cut-off. The returned arrays are shared and must not be changed.
+    :param method: 'filtfilt' for (b, a) coefficients or 'sosfiltfilt' for second order sections
+    :param order: the order of the filter
+    :param cutoff: the normalized cut-off
+    :return: (b, a) or the sos array
+    """
+    if method == 'sosfiltfilt':
+        return signal.butter(order, cutoff, 'low', output='sos')
+    return signal.butter(order, cutoff, 'low')
+
+
+def smooth(values, config, cutoff):
+    """
+    The smooth method low-pass filters resampled positions along their last axis with the method of the configuration.
+    All rows are filtered in one call. Trials too short for the padding of the filter are padded as much as they can
+    be, so no trial makes the filter raise.
+    :param values: numpy array of resampled positions, one trial or one row per trial
+    :param config: A resampling configuration dictionary as returned by resampling
+    :param cutoff: the normalized cut-off, as returned by cutoff_frequency (not used by savgol)
+    :return: the filtered numpy array
+    """
+    method = config['Method']
+    npoints = values.shape[-1]
+    if method == 'savgol':
+        window = min(int(config['Window']) | 1, npoints if npoints % 2 else npoints - 1)  # odd, at most npoints
+        return signal.savgol_filter(values, window, min(int(config['Polyorder']), window - 1), axis=-1)
+
+    design = filter_design(method, int(config['Order']), float(cutoff))
+    padtype = None if (config['Padding'] or 'none') == 'none' else config['Padding']
+    padlen = pad_length(method, design, npoints, config['Padlen']) if padtype else None
+    if method == 'sosfiltfilt':
+        return signal.sosfiltfilt(design, values, axis=-1, padtype=padtype, padlen=padlen)
+    b, a = design
+    return signal.filtfilt(b, a, values, axis=-1, padtype=padtype, padlen=padlen)
+
+
+def pad_length(method, design, npoints, padlen=None):
+    """
+    The pad_length method works out how many points filtfilt or sosfiltfilt add at both edges of a trial. It is the
+    default of scipy (3 times the number of taps) unless given, and at most one less than the points of the trial,
+    which is the most scipy accepts.
+    :param method: 'filtfilt' or 'sosfiltfilt'
+    :param design: the filter as returned by filter_design
+    :param npoints: the number of points of the trial
+    :param padlen: the padding length of the setting, None or '' for the default
+    :return: the padding length
+    """
+    if padlen not in (None, ''):
+        padlen = int(padlen)
+    elif method == 'sosfiltfilt':
+        ntaps = 2 * len(design) + 1 - min((design[:, 2] == 0).sum(), (design[:, 5] == 0).sum())
+        padlen = 3 * ntaps
+    else:
+        b, a = design
+        padlen = 3 * max(len(a), len(b))
+    return max(min(padlen, npoints - 1), 0)
+
+
+def detection(setting=None):
+    """
+    The detection method reads the 'Detection' block of a setting, filling in the defaults of DETECTION
+    :param setting: Setting dictionary, or None for the defaults
+    :return: A detection configuration dictionary
+    """
+    config = dict(DETECTION)
+    if setting:
+        config.update(setting.get('Detection') or {})
+    if config['Method'] not in DETECTORS:
+        raise ValueError('Unknown detector ' + str(config['Method']) + ', use one of ' + ', '.join(sorted(DETECTORS)))
+    return config
+
+
+def movement_bounds(speed, time, peak, config):
+    """
+    The movement_bounds method finds the movement onset and offset of resampled speed profiles with the detector of a
+    detection configuration. Every detector works on all rows at once and returns an onset at or before the peak and
+    an offset after it whenever the profile allows.
+    :param speed: 2-D numpy array of resampled speeds (cm/ms), one row per trial
+    :param time: 2-D numpy array of the resampled times (ms) of speed
+    :param peak: numpy array of the index of the peak speed of every row
+    :param config: A detection configuration dictionary as returned by detection
+    :return: numpy arrays of the onset (p1) and offset (p2) indices of every row
+    """
+    return DETECTORS[config['Method']](speed, time, peak, config)
+
+
+def first_index(mask, default):
+    """
+    The first_index method finds the first True of every row of a boolean array
+    :param mask: 2-D boolean numpy array
+    :param default: the index, or numpy array of indices, of the rows without any True
+    :return: numpy array of indices
+    """
+    return np.where(mask.any(axis=1), mask.argmax(axis=1), default)
+
+
+def sustained(mask, samples):
+    """
+    The sustained method marks the samples starting a run of at least samples consecutive True values of every row.
+    A run cut short by the end of the row counts when it lasts to the end.
+    :param mask: 2-D boolean numpy array
+    :param samples: the length of the runs
+    :return: 2-D boolean numpy array
+    """
+    npoints = mask.shape[1]
+    counts = np.zeros((mask.shape[0], npoints + 1), dtype=int)
+    counts[:, 1:] = np.cumsum(mask, axis=1)
+    starts = np.arange(npoints)
+    ends = np.minimum(starts + samples, npoints)
+    return (counts[:, ends] - counts[:, starts]) == (ends - starts)
+
+
+def threshold_bounds(speed, peak, threshold, samples=1):
+    """
+    The threshold_bounds method finds the first sample above a speed threshold as onset and the first sample after the
+    peak at or below it as offset, or the sample after the peak when the speed never drops that low
+    :param speed: 2-D numpy array of resampled speeds, one row per trial
+    :param peak: numpy array of the index of the peak speed of every row
+    :param threshold: the threshold, or a column numpy array of one threshold per row
+    :param samples: the number of consecutive samples that must pass the threshold
+    :return: numpy arrays of the onset and offset indices of every row
+    """
+    after_peak = np.arange(speed.shape[1])[None, :] > peak[:, None]
+    above, below = speed > threshold, speed <= threshold
+    if samples > 1:
+        above, below = sustained(above, samples), sustained(below, samples)
+    return first_index(above, 0), first_index(after_peak & below, np.minimum(peak + 1, speed.shape[1] - 1))
+
+
+def percent_of_peak(speed, time, peak, config):
+    """
+    The percent_of_peak detector uses Percent of the peak speed of every trial as threshold
+    """
+    return threshold_bounds(speed, peak, speed[np.arange(len(peak)), peak][:, None] * float(config['Percent']) / 100)
+
+
+def absolute_threshold(speed, time, peak, config):
+    """
+    The absolute_threshold detector uses the same Threshold in cm/s for every trial
+    """
+    return threshold_bounds(speed, peak, float(config['Threshold']) / 1000)
+
+
+def sustained_threshold(speed, time, peak, config):
+    """
+    The sustained_threshold detector uses Percent of the peak speed as threshold, which must be passed for Samples
+    consecutive resampled samples, so that a short burst of noise is neither an onset nor an offset
+    """
+    return threshold_bounds(speed, peak, speed[np.arange(len(peak)), peak][:, None] * float(config['Percent']) / 100,
+                            max(int(config['Samples']), 1))
+
+
+def acceleration_threshold(speed, time, peak, config):
+    """
+    The acceleration_threshold detector starts the movement at the first sample before the peak whose acceleration is
+    above Acceleration in cm/s^2, and ends it at the first sample after the peak deceleration whose deceleration is back
+    below Acceleration
+    """
+    acceleration = np.zeros(speed.shape)
+    acceleration[:, 1:] = np.diff(speed, axis=1) / np.diff(time, axis=1) * 1e6  # cm/ms^2 to cm/s^2
+    threshold = float(config['Acceleration'])
+    indices = np.arange(speed.shape[1])[None, :]
+    onset = first_index((indices <= peak[:, None]) & (acceleration > threshold), 0)
+    deceleration = np.where(indices > peak[:, None], acceleration, np.inf).argmin(axis=1)
+    offset = first_index((indices > deceleration[:, None]) & (acceleration >= -threshold), speed.shape[1] - 1)
+    return onset, np.where(peak < speed.shape[1] - 1, offset, peak)
+
+
+# The onset and offset detectors a setting can choose from, by name. A detector takes the resampled speeds, times and
+# peak indices of a batch of trials and the detection configuration and returns the onset and offset indices.
+DETECTORS = {'percent': percent_of_peak,
+             'threshold': absolute_threshold,
+             'acceleration': acceleration_threshold,
+             'sustained': sustained_threshold}
+
+
+def time_index(time_ms, time, side='left'):
+    """
+    The time_index method finds samples by their time with a binary search of the sorted sample times, instead of
+    scanning them
+    :param time_ms: sorted numpy array of the sample times of a trial, or of a session as returned by session_time
+    :param time: a time or a numpy array of times
+    :param side: 'left' for the first sample at or after the time, 'right' for the first sample after it
+    :return: the position of the sample or a numpy array of positions, the last sample when none is found
+    """
+    return np.minimum(np.searchsorted(time_ms, time, side=side), len(time_ms) - 1)
+
+
+def session_time(time_ms, lengths):
+    """
+    The session_time method shifts every trial to its own stretch of time, so that the sample times of all trials
+    are sorted together and time_index finds the samples of every trial in one call
+    :param time_ms: numpy array of the sample times, grouped by trial as ordered by trial_order
+    :param lengths: numpy array with the number of samples of each trial
+    :return: the shifted sample times and the offset added to the times of each trial
+    """
+    ends = np.cumsum(lengths)
+    first, last = time_ms[ends - lengths], time_ms[ends - 1]
+    offsets = np.cumsum(np.append(0, (last - first + 1)[:-1])) - first
+    return time_ms + np.repeat(offsets, lengths), offsets
+
+
+def sample_index(time_ms, lengths, time, side='left'):
+    """
+    The sample_index method is time_index for many trials at once: it finds every time among the samples of its own
+    trial, so that it gives the same sample as time_index on the trial alone
+    :param time_ms: numpy array of the sample times, grouped by trial as ordered by trial_order
+    :param lengths: numpy array with the number of samples of each trial
+    :param time: numpy array of one time per trial
+    :param side: 'left' for the first sample at or after the time, 'right' for the first sample after it
+    :return: numpy array of positions in time_ms, the last sample of the trial when none is found
+    """
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    shifted_time, offsets = session_time(time_ms, lengths)
+    position = np.clip(np.searchsorted(shifted_time, time + offsets, side=side), starts, ends)
+
+    # the shift can round a time onto a neighbouring sample, one step puts it back among the unshifted times
+    passed = np.greater if side == 'right' else np.greater_equal
+    previous = np.maximum(position - 1, 0)
+    position = np.where((position > starts) & passed(time_ms[previous], time), previous, position)
+    current = np.minimum(position, len(time_ms) - 1)
+    position = np.where((position < ends) & ~passed(time_ms[current], time), position + 1, position)
+    return np.minimum(position, ends - 1)
+
+
+def calculate_speeds(x, y, Time):
+    """
+    The calculate speed method calculates 2D cartesian velocity
+    :param x: numpy array of the x_cordinates of the data
+    :param y: numpy array of the y_cordinates of the data
+    :param Time: numpy array of the time_cordinates of the data
+    :return: numpy array of the caluclated velocity
+    """
+    [xdiff, ydiff, timediff] = map(np.diff, [x, y, Time])
+    return np.divide(np.sqrt(np.add(np.square(xdiff), np.square(ydiff))), timediff)
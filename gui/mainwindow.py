@@ -1,14 +1,21 @@
 import wx, os
 from wx import *
+from pubsub import pub
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_wxagg import FigureCanvasWxAgg as FigureCanvas
-from database.Read_Data import set_data
-from database.Plot_Data import velocity_profiler, reach_profiler
-from gui import settingwindow
+from database.Read_Data import set_data, load_setting, LoadCancelled, store_trial, trial_values, output_path
+from database.Plot_Data import velocity_profiler, VelocityPlot, ReachPlot, SelectionDragger, Blitter
+from database.Select_Data import mark_selection, velocityselect
+from database.Prefetch_Data import TrialPrefetcher, profile_trial, prefetch_depth
+from database.Journal_Data import journal_path, decision, replay_journal, compact_journal, resume_index, Autosaver
+from database.Metrics_Data import metrics_path, write_metrics
+from database.Score_Data import score_trials
+from gui import settingwindow, overviewwindow
 import numpy as np
 import json
 from pathlib import Path
 import logging
+import threading
 
 
 class MyApp(wx.App):
@@ -96,9 +103,17 @@ class MyFrame(wx.Frame):
 
     def OnClose(self, event):
         """
-        The onclose method is bound to closing the window . It closes the wxpython app, logs finished and exists
-        the running python instance
-        """
+        The onclose method is bound to closing the window . It writes the pending decisions to the journal, closes the
+        wxpython app, logs finished and exists the running python instance
+        """
+        if self.MainPanel.Loader is not None:
+            self.MainPanel.Loader.cancel()
+        if self.MainPanel.Autosaver is not None:
+            if self.MainPanel.ButtonPanel.IsEnabled() and self.MainPanel.trial_data.accept.min():
+                self.MainPanel.updateoutput()  # the decision on the trial shown
+            self.MainPanel.Autosaver.flush()
+        if self.MainPanel.Prefetcher is not None:
+            self.MainPanel.Prefetcher.shutdown()
         self.Destroy()
         logging.info('Finished')
         exit()
@@ -121,6 +136,12 @@ class MainPanel(wx.Panel):
         self.Fixp1p2mode = False
         self.clicknum = 1
         self.selected_velocity = 'pyselect'
+        self.SelectionDragger = None
+        self.Prefetcher = None
+        self.Loader = None
+        self.LoadDialog = None
+        self.Autosaver = None
+        self.reach = None
         self.warningmsg = wx.MessageDialog(self, 'Please Choose Settings first', caption=MessageBoxCaptionStr,
                                            style=OK | CENTRE, pos=DefaultPosition)
         self.__setpanel()
@@ -128,6 +149,10 @@ class MainPanel(wx.Panel):
         self.settingfolder = json.load(open(self.parent.setting_json))['Location']
         self.VelocityCanvas.mpl_connect('button_press_event',
                                         self.onVelcoityclick)
+        pub.subscribe(self.onloadprogress, 'load.progress')
+        pub.subscribe(self.onloadfirst, 'load.first')
+        pub.subscribe(self.onloaddone, 'load.done')
+        pub.subscribe(self.onloadfailed, 'load.failed')
 
     def __setpanel(self):
         """
@@ -158,7 +183,7 @@ class MainPanel(wx.Panel):
         """e
         the __setreachplot creates an empty canvas and figure on load up for the reach plot
         """
-        fig = plt.figure()
+        fig = plt.figure(facecolor='gray', edgecolor='b')
         plt.axis([0, 1, 0, 1])
         self.ReachCanvas = FigureCanvas(self, -1, fig)
         self.ReachCanvas.draw()
@@ -167,7 +192,7 @@ class MainPanel(wx.Panel):
         """
         the __setvelocityplot creates an empty canvas and figure on load up for the velocity plot
         """
-        fig = plt.figure()
+        fig = plt.figure(facecolor='gray', edgecolor='r')
         fig.add_axes([0.1, 0.3, 0.8, 0.4])
         fig.set_size_inches(3, 3)
         self.VelocityCanvas = FigureCanvas(self, -1, fig)
@@ -182,9 +207,11 @@ class MainPanel(wx.Panel):
         selection = self.trial_data.index[
             self.trial_data.time_ms.between(self.trial_data.selectedp1, self.trial_data.selectedp2)]
         self.trial_data.loc[selection, 'selected'] = 1
-        fig = reach_profiler(self.trial_data, self.setting, self.experiment['all_targets'])
-        fig.gca().set_aspect('auto')
-        self.ReachCanvas.figure = fig
+        if self.reach is not None:  # prefetched with the trial
+            self.ReachPlot.update(self.reach)
+            self.reach = None
+        else:
+            self.ReachPlot.update(self.trial_data)
         self.ReachCanvas.draw()
 
     def __updatevelocityplot(self):
@@ -202,35 +229,29 @@ class MainPanel(wx.Panel):
             self.trial_data.selected = 0
             self.trial_data.selected[selection_index] = 1
             self.selected_velocity = 'pyselect'
-            self.VelocityCanvas.figure.get_axes()[0].get_children()[2].set_xdata(self.trial_data.selectedp1)
-            self.VelocityCanvas.figure.get_axes()[0].get_children()[3].set_xdata(self.trial_data.selectedp2)
             logging.debug('p1 value on fixp1p2: {}'.format(self.trial_data.selectedp1))
             logging.debug('p2 value on fixp1p2: {}'.format(self.trial_data.selectedp2))
 
             if ~(self.trial_data.selectedp1 <= self.trial_data.selectedmaxvelocity <= self.trial_data.selectedp2):
                 self.max_position = velocity_profiler(self.trial_data, 'update')
-                self.VelocityCanvas.figure.get_axes()[0].get_children()[1].set_xdata(
-                    self.trial_data.selectedmaxvelocity)
             logging.debug('maxvelocity on fixp1p2: {}'.format(self.trial_data.selectedmaxvelocity))
-            self.VelocityCanvas.figure.gca().set_aspect('auto')
+            self.VelocityPlot.set_selection(self.trial_data.selectedp1, self.trial_data.selectedp2,
+                                            self.trial_data.selectedmaxvelocity)
             self.VelocityCanvas.draw()
 
         else:
             if self.selected_velocity is 'pyselect':  # will always happen first.
-                [fig, self.max_position] \
-                    = velocity_profiler(self.trial_data, self.selected_velocity)
+                if self.reach is None:  # not prefetched
+                    self.max_position = velocityselect(self.trial_data, self.setting)
                 logging.debug('maxvelocity on pyselect: {}'.format(self.trial_data.selectedmaxvelocity))
-
-                self.VelocityCanvas.figure = fig
+                self.VelocityPlot.update(self.trial_data)
 
             elif self.selected_velocity is 'user':
                 logging.debug('maxvelocity on user select: {}'.format(self.trial_data.selectedmaxvelocity))
-                # maybe do this differently (outsource to a function?) . Consider this later.
-                self.VelocityCanvas.figure.get_axes()[0].get_children()[1].set_xdata(
-                    self.trial_data.selectedmaxvelocity)
+                self.VelocityPlot.set_selection(self.trial_data.selectedp1, self.trial_data.selectedp2,
+                                                self.trial_data.selectedmaxvelocity)
                 self.selected_velocity = 'pyselect'
 
-            self.VelocityCanvas.figure.gca().set_aspect('auto')
             self.VelocityCanvas.draw()
 
     # def OnItemSelected(self, event):
@@ -244,6 +265,9 @@ class MainPanel(wx.Panel):
          based on the current state of pyselector.
         :param event: event instance on interaction with the velocity plot
         """
+        if self.SelectionDragger is not None and self.SelectionDragger.press(event):
+            return
+
         if self.Fixp1p2mode:
             self.fixp1p2(event)
             self.selected_velocity = 'pyselect'
@@ -251,7 +275,7 @@ class MainPanel(wx.Panel):
         else:
             self.selected_velocity = 'user'
             self.trial_data.selectedmaxvelocity = event.xdata
-            self.refresh()
+            self.refresh(layout=False)
 
     def fixp1p2(self, event):
         """
@@ -264,34 +288,204 @@ class MainPanel(wx.Panel):
         elif self.clicknum == 2:
             self.trial_data.selectedp2 = event.xdata
             self.clicknum = 1
-            self.refresh()
+            self.refresh(layout=False)
 
     def set_settings(self, setting_name):
         """
-        the set_settings method logs the settings and updates the info panel
+        the set_settings method logs the settings and updates the info panel. When an experiment is shown, the new
+        setting is read and handed to the prefetcher, so the trials shown from now on are resampled and selected with it.
+        Its units and header only apply once the experiment is loaded again.
         :param setting_name: String of name of the selected settings
         """
         logging.info('setting_name set to %s \n', setting_name)
         self.InfoPanel.set_settings(setting_name)
+        if self.Prefetcher is not None:
+            self.setting = load_setting(self.settingfolder, os.path.splitext(setting_name)[0])
+            self.Prefetcher.invalidate(self.setting)
 
     def set_exp(self, exp_name):
         """
-        the set_exp method logs the experiment name and updates the info panel. If no settings has been selected yet,
-        it creates and displays up a warning message.
+        the set_exp method logs the experiment name and starts loading it in a LoadThread, with a progress dialog
+        that can cancel the load. If no settings has been selected yet, it creates and displays up a warning message.
         :param exp_name: String of name of the selected experiment
         """
         logging.info('exp_name set to %s \n', exp_name)
         if self.InfoPanel.setting.GetLabel() == 'None':
             self.warningmsg.ShowModal()
         else:
-            self.experiment, self.setting = set_data(exp_name, self.settingfolder, self.InfoPanel.setting.GetLabel())
-            self.experiment_path = os.path.abspath(os.path.join(exp_name, os.pardir))
-            self.experiment_name = os.path.splitext(os.path.basename(exp_name))[0]
-            if 'selected' in self.experiment_name:
-                self.output_name = self.experiment_name
-            else:
-                self.output_name = self.experiment_name + '_selected.csv'
-            self.InfoPanel.set_exp(self.experiment_name, self.experiment)
+            if self.Loader is not None:
+                self.Loader.cancel()
+            self.close_loaddialog()
+            self.ButtonPanel.Disable()
+            self.InfoPanel.trial_index = 0
+            self.LoadDialog = wx.ProgressDialog('Loading', os.path.basename(exp_name), maximum=100, parent=self,
+                                                style=wx.PD_CAN_ABORT | wx.PD_AUTO_HIDE | wx.PD_ELAPSED_TIME)
+            self.Loader = LoadThread(exp_name, self.settingfolder, self.InfoPanel.setting.GetLabel())
+            self.Loader.start()
+
+    def onloadprogress(self, loader, fraction):
+        """
+        The onloadprogress method updates the progress dialog, and cancels the load when its cancel button was pressed
+        :param loader: the LoadThread sending the message
+        :param fraction: the fraction of the file read so far
+        """
+        if loader is self.Loader and self.LoadDialog is not None:
+            keep_going, skip = self.LoadDialog.Update(int(fraction * 100))
+            if not keep_going:
+                loader.cancel()
+
+    def onloadfirst(self, loader, experiment, setting):
+        """
+        The onloadfirst method shows the first trial of the experiment while the rest of it is still being loaded
+        :param loader: the LoadThread sending the message
+        :param experiment: configuration dictionary of an experiment holding only the first trial
+        :param setting: setting dictionary of the experiment
+        """
+        if loader is self.Loader:
+            loader.previewed = True
+            self.show_preview(loader.exp_name, experiment, setting)
+
+    def onloaddone(self, loader, experiment, setting):
+        """
+        The onloaddone method shows the loaded experiment and enables the buttons again
+        :param loader: the LoadThread sending the message
+        :param experiment: configuration dictionary of the experiment
+        :param setting: setting dictionary of the experiment
+        """
+        if loader is self.Loader:
+            self.Loader = None
+            self.close_loaddialog()
+            self.show_exp(loader.exp_name, experiment, setting)
+            self.ButtonPanel.Enable()
+            self.ButtonPanel.SetFocus()
+
+    def onloadfailed(self, loader, message):
+        """
+        The onloadfailed method closes the progress dialog of a cancelled or failed load and shows why it failed
+        :param loader: the LoadThread sending the message
+        :param message: the error message, None when the load was cancelled
+        """
+        if loader is self.Loader:
+            self.Loader = None
+            self.close_loaddialog()
+            if hasattr(self, 'experiment') and not loader.previewed:  # the experiment loaded before is still shown
+                self.ButtonPanel.Enable()
+            if message is not None:
+                wx.MessageBox(message, 'Loading failed', style=OK | ICON_ERROR)
+
+    def close_loaddialog(self):
+        """
+        The close_loaddialog method destroys the progress dialog of the current load
+        """
+        if self.LoadDialog is not None:
+            self.LoadDialog.Destroy()
+            self.LoadDialog = None
+
+    def show_preview(self, exp_name, experiment, setting):
+        """
+        The show_preview method only draws the first trial of an experiment that is still being loaded. The
+        prefetcher, the autosave journal and the resume position are set up by show_exp once the load is done, and the
+        buttons stay disabled until then.
+        :param exp_name: String of name of the selected experiment
+        :param experiment: configuration dictionary of an experiment holding only the first trial
+        :param setting: setting dictionary of the experiment
+        """
+        self.experiment, self.setting = experiment, setting
+        self.set_plots()
+        self.trial_no = experiment['trials'][0]
+        self.trial_data, self.max_position, self.reach = profile_trial(experiment, setting, self.trial_no)
+        self.InfoPanel.set_preview(os.path.splitext(os.path.basename(exp_name))[0], experiment)
+        self.refresh()
+
+    def show_exp(self, exp_name, experiment, setting):
+        """
+        The show_exp method makes a loaded experiment the current one and shows its first trial
+        :param exp_name: String of name of the selected experiment
+        :param experiment: configuration dictionary of the experiment
+        :param setting: setting dictionary of the experiment
+        """
+        self.experiment, self.setting = experiment, setting
+        self.set_plots()
+        if self.Prefetcher is not None:
+            self.Prefetcher.shutdown()
+        self.Prefetcher = TrialPrefetcher(self.experiment, self.setting,
+                                          depth=prefetch_depth(self.setting))
+        self.experiment_name = os.path.splitext(os.path.basename(exp_name))[0]
+        self.output_address = output_path(exp_name)
+        if self.Autosaver is not None:
+            self.Autosaver.flush()
+        replayed = replay_journal(self.experiment, journal_path(self.output_address))
+        if replayed:
+            logging.info('%d trials recovered from the journal \n', replayed)
+        self.Autosaver = Autosaver(journal_path(self.output_address))
+        self.InfoPanel.trial_index = resume_index(self.experiment)
+        self.InfoPanel.set_exp(self.experiment_name, self.experiment)
+
+    def set_plots(self):
+        """
+        The set_plots method creates the velocity and reach plots of a newly loaded experiment. Their artists are
+        reused for every trial of the experiment.
+        """
+        self.VelocityPlot = VelocityPlot(self.VelocityCanvas.figure)
+        self.VelocityPlot.axes.set_aspect('auto')
+        self.ReachPlot = ReachPlot(self.ReachCanvas.figure, self.setting, self.experiment['all_targets'])
+        self.ReachPlot.axes.set_aspect('auto')
+        if self.SelectionDragger is not None:
+            self.SelectionDragger.disconnect()
+            self.ReachBlitter.disconnect()
+        self.SelectionDragger = SelectionDragger(self.VelocityPlot, self.ondrag, self.ondragend)
+        self.ReachBlitter = Blitter(self.ReachCanvas, [self.ReachPlot.hand_line, self.ReachPlot.cursor_line,
+                                                       self.ReachPlot.max_penvelocity,
+                                                       self.ReachPlot.max_cursorvelocity])
+
+    def dragged_selection(self, name, xdata):
+        """
+        The dragged_selection method returns p1, p2 and max velocity with one of them replaced by a dragged line
+        :param name: 'p1', 'p2' or 'max_velocity'
+        :param xdata: the time the line is dragged to
+        :return: a list of p1, p2 and max velocity
+        """
+        selection = {'p1': self.trial_data.selectedp1, 'p2': self.trial_data.selectedp2,
+                     'max_velocity': self.trial_data.selectedmaxvelocity}
+        selection[name] = xdata
+        return [selection['p1'], selection['p2'], selection['max_velocity']]
+
+    def ondrag(self, name, xdata):
+        """
+        The ondrag method is called while a p1, p2 or max velocity line is dragged. It moves the reach plot along,
+        redrawing only the reach and the max velocity circles.
+        :param name: 'p1', 'p2' or 'max_velocity'
+        :param xdata: the time the line is dragged to
+        """
+        if not self.ReachBlitter.active:
+            self.ReachBlitter.start()
+        self.ReachPlot.show_selection(self.trial_data, *self.dragged_selection(name, xdata))
+        self.ReachBlitter.update()
+
+    def ondragend(self, name, xdata):
+        """
+        The ondragend method is called when a p1, p2 or max velocity line is dropped. It stores the new selection in
+        trial_data and updates both plots, without the full refresh of the panel.
+        :param name: 'p1', 'p2' or 'max_velocity'
+        :param xdata: the time the line is dropped at
+        """
+        p1, p2, max_velocity = self.dragged_selection(name, xdata)
+        self.trial_data.selectedp1, self.trial_data.selectedp2 = min(p1, p2), max(p1, p2)
+        self.trial_data.selectedmaxvelocity = max_velocity
+        self.trial_data['selected'] = self.trial_data.time_ms.between(self.trial_data.selectedp1,
+                                                                      self.trial_data.selectedp2).astype(int)
+        if name != 'max_velocity' and not (
+                self.trial_data.selectedp1 <= self.trial_data.selectedmaxvelocity <= self.trial_data.selectedp2):
+            self.max_position = velocity_profiler(self.trial_data, 'update')
+        logging.debug('{} dragged to {}'.format(name, xdata))
+
+        if self.ReachBlitter.active:
+            self.ReachBlitter.stop()
+        self.VelocityPlot.set_selection(self.trial_data.selectedp1, self.trial_data.selectedp2,
+                                        self.trial_data.selectedmaxvelocity)
+        self.ReachPlot.update(self.trial_data)
+        self.VelocityCanvas.draw_idle()
+        self.ReachCanvas.draw_idle()
 
     def set_trial_data(self, trial):
         """
@@ -302,42 +496,66 @@ class MainPanel(wx.Panel):
         logging.info('=================== \n')
         logging.info('trial set to %s \n ', trial)
         logging.info('=================== \n')
-        self.trial_data = self.experiment['output'].where(self.experiment['output'].trial_no == trial)
-        self.trial_data.dropna(inplace=True)
+        self.trial_no = trial
+        self.trial_data, self.max_position, self.reach = self.Prefetcher.get(trial)
         self.refresh()
 
-    def refresh(self):
+    def prefetch(self, trial_index):
+        """
+        the prefetch method starts computing the trials around the current trial in the background
+        :param trial_index: the index of the current trial
+        """
+        self.Prefetcher.prefetch(trial_index)
+
+    def flagged_indices(self):
+        """
+        The flagged_indices method lists the trials to review in the flagged only mode of the button panel
+        :return: A numpy array of the indices of the flagged trials, or None when the mode is off or the experiment
+        was not scored
+        """
+        scores = self.experiment.get('scores')
+        if not self.ButtonPanel.FlaggedOnly.GetValue() or scores is None:
+            return None
+        return np.flatnonzero(scores['flagged'].values)
+
+    def refresh(self, layout=True):
         """
         The refresh method logs refresh on every call. It updates the velocityplot, reachplot, infopanel and
         creates the appropriate layout for pyselector.
+        :param layout: set to False to skip the layout of the panel, when only the plots changed
         """
         logging.info('REFRESH \n')
         self.__updatevelocityplot()
         self.__updatereachplot()
         self.InfoPanel.update()
-        self.Fit()
-        self.__dolayout()
-        self.Layout()
+        if layout:
+            self.Fit()
+            self.__dolayout()
+            self.Layout()
 
     def updateoutput(self):
         """
         The updateoutput method updates the output dataframe of the experiment dictionary for mainpanel.  It sets
         the selected portion, p1-p2 and the max velocity index as accepted/rejected by user
         """
-        maxvel_idx = next(
-            x[0] for x in enumerate(self.trial_data.time_ms) if x[1] >= self.trial_data.selectedmaxvelocity)
-        p1_idx = next(x[0] for x in enumerate(self.trial_data.time_ms) if x[1] >= self.trial_data.selectedp1)
-        p2_idx = next(x[0] + 1 for x in enumerate(self.trial_data.time_ms) if x[1] >= self.trial_data.selectedp2)
-        self.trial_data.selected.iloc[p1_idx:p2_idx] = 1
-        self.trial_data.max_velocity.iloc[maxvel_idx] = 1
-        self.experiment['output'].update(self.trial_data)
+        mark_selection(self.trial_data)
+        store_trial(self.experiment, self.trial_no, self.trial_data)
+        self.Prefetcher.discard(self.trial_no)
+        record = decision(self.trial_no, self.trial_data)
+        if record['accept'] or record['unsure']:
+            self.Autosaver.record(record)
+        pub.sendMessage('trial.stored', experiment=self.experiment, trial=self.trial_no)
 
     def outputdata(self):
         """
-        the outputdata method creates and writes the output csv file of pyselector
+        the outputdata method creates and writes the output csv file of pyselector and its metrics table. The decisions
+        journal, written on every decision by the autosave of updateoutput, is then part of the output file and removed.
         :return:
         """
-        self.experiment['output'].to_csv(os.path.join(self.experiment_path, self.output_name + '.csv'), index=False)
+        self.Autosaver.flush()
+        compact_journal(self.experiment, self.output_address)
+        self.Autosaver.clear()
+        write_metrics(self.experiment, metrics_path(self.output_address))
 
 
 class InfoPanel(wx.Panel):
@@ -353,16 +571,18 @@ class InfoPanel(wx.Panel):
         self.trial_mode = wx.StaticText(self, -1, 'not_selected')
         self.experiment = wx.StaticText(self, -1, 'none')
         self.trial = wx.StaticText(self, -1, '0/0')
+        self.confidence = wx.StaticText(self, -1, '-')
 
         settinglabel = wx.StaticText(self, -1, "Setting:")
         experimentlabel = wx.StaticText(self, -1, "Experiment:")
         triallabel = wx.StaticText(self, -1, "Trials:")
         acceptedlabel = wx.StaticText(self, -1, "Trial_mode:")
+        confidencelabel = wx.StaticText(self, -1, "Confidence:")
 
-        sizer = wx.GridSizer(rows=4, cols=2, hgap=5, vgap=5)
+        sizer = wx.GridSizer(rows=5, cols=2, hgap=5, vgap=5)
 
         sizer.AddMany([settinglabel, self.setting, experimentlabel, self.experiment,
-                       triallabel, self.trial, acceptedlabel, self.trial_mode])
+                       triallabel, self.trial, acceptedlabel, self.trial_mode, confidencelabel, self.confidence])
         self.SetSizer(sizer)
 
     def update(self):
@@ -370,7 +590,7 @@ class InfoPanel(wx.Panel):
         The update method sets the trial label and the accepted/rejected mode of info panel.
         :return:
         """
-        self.trial.SetLabel(str(self.current_trial) + '/' + str(self.all_trials.iloc[-1]))
+        self.trial.SetLabel(str(self.current_trial) + '/' + str(self.all_trials[-1]))
         self.set_mode()
 
     def set_settings(self, setting_name):
@@ -392,15 +612,48 @@ class InfoPanel(wx.Panel):
         """
         if isinstance(direction, (int, float)):
             self.current_trial = direction
-            self.trial_index = np.where(self.all_trials.unique() == self.current_trial)[0][0]
+            self.trial_index = np.where(self.all_trials == self.current_trial)[0][0]
         elif direction is 'up':
-            self.trial_index += 1
-            self.current_trial = self.all_trials.unique()[self.trial_index]
+            self.trial_index = self.next_index(1)
+            self.current_trial = self.all_trials[self.trial_index]
         elif direction is 'down':
-            self.trial_index -= 1
-            self.current_trial = self.all_trials.unique()[self.trial_index]
+            self.trial_index = self.next_index(-1)
+            self.current_trial = self.all_trials[self.trial_index]
 
         self.parent.set_trial_data(self.current_trial)
+        self.parent.prefetch(self.trial_index)
+        self.set_confidence()
+
+    def next_index(self, step):
+        """
+        The next_index method finds the index of the next or previous trial. In the flagged only mode of the button
+        panel it skips the trials that score_trials did not flag, and stays on the current trial when there is no
+        flagged trial left in that direction.
+        :param step: 1 for the next trial, -1 for the previous trial
+        :return: the trial index
+        """
+        flagged = self.parent.flagged_indices()
+        if flagged is None:
+            return self.trial_index + step
+        if step > 0:
+            following = flagged[flagged > self.trial_index]
+        else:
+            following = flagged[flagged < self.trial_index][::-1]
+        if not following.size:
+            wx.Bell()
+            return self.trial_index
+        return following[0]
+
+    def set_confidence(self):
+        """
+        The set_confidence method sets the confidence label of the current trial, as scored by score_trials
+        """
+        scores = self.parent.experiment.get('scores')
+        if scores is None:
+            self.confidence.SetLabel('-')
+        else:
+            row = scores.iloc[self.trial_index]
+            self.confidence.SetLabel('{:.2f}{}'.format(row.confidence, ' (flagged)' if row.flagged else ''))
 
     def set_exp(self, exp_name, experiment):
         """
@@ -411,11 +664,26 @@ class InfoPanel(wx.Panel):
         """
         self.experiment.SetLabel(exp_name)
         # ====  RECODE maybe? / there has to be a nicer way of handling this
-        self.current_trial = experiment['output'].trial_no.iloc[self.trial_index]
-        self.all_trials = experiment['output'].trial_no
-        self.trial.SetLabel(str(self.current_trial) + '/' + str(self.all_trials.iloc[-1]))
+        self.all_trials = experiment['trials']
+        self.current_trial = self.all_trials[self.trial_index]
+        self.trial.SetLabel(str(self.current_trial) + '/' + str(self.all_trials[-1]))
         self.parent.set_trial_data(self.current_trial)
+        self.parent.prefetch(self.trial_index)
         self.set_mode()
+        self.set_confidence()
+
+    def set_preview(self, exp_name, experiment):
+        """
+        The set_preview method updates the experiment and trial labels for the first trial of an experiment that is
+        still being loaded, without selecting the trial (see MainPanel.show_preview)
+        :param exp_name: String name of the experiment selected by uesr
+        :param experiment: Dictionary holding only the first trial of the experiment
+        """
+        self.experiment.SetLabel(exp_name)
+        self.all_trials = experiment['trials']
+        self.trial_index = 0
+        self.current_trial = self.all_trials[0]
+        self.confidence.SetLabel('-')
 
     def set_mode(self):
         """
@@ -451,16 +719,18 @@ class ButtonPanel(wx.Panel):
         self.GotoButton = wx.Button(self, label="Go")
         self.Next = wx.Button(self, label="Next")
         self.Previous = wx.Button(self, label="Previous")
+        self.FlaggedOnly = wx.CheckBox(self, label="Flagged only")
         self.BackgroundColour = wx.Colour('GRAY')
 
         goto_sizer = wx.BoxSizer(wx.HORIZONTAL)
         goto_sizer.AddMany([(self.Goto, 1 / 3), (self.GotoButton, 2 / 3)])
-        self.gridSizer = wx.GridSizer(rows=4, cols=2, hgap=2, vgap=2)
+        self.gridSizer = wx.GridSizer(rows=5, cols=2, hgap=2, vgap=2)
         self.gridSizer.AddMany([
             (self.FixP1P2, wx.ALIGN_CENTER), (self.SetMax, wx.ALIGN_CENTER),
             goto_sizer, (self.Unsure, wx.ALIGN_CENTER),
             (self.Save, wx.ALIGN_CENTER), (self.Delete, wx.ALIGN_CENTER),
-            (self.Previous), (self.Next)
+            (self.Previous), (self.Next),
+            (self.FlaggedOnly, wx.ALIGN_CENTER)
         ])
         self.SetSizer(self.gridSizer)
 
@@ -473,7 +743,7 @@ class ButtonPanel(wx.Panel):
         self.Bind(wx.EVT_BUTTON, self.nexttrial, self.Next)
         self.Bind(wx.EVT_BUTTON, self.prvstrial, self.Previous)
         self.Bind(wx.EVT_TOGGLEBUTTON, self.fixp1p2, self.FixP1P2)
-        self.Bind(wx.EVT_TOGGLEBUTTON, self.unsuretrial, self.Unsure)
+        self.Bind(wx.EVT_CHECKBOX, self.unsuretrial, self.Unsure)
         self.Bind(wx.EVT_TOGGLEBUTTON, self.savetrial, self.Save)
         self.Bind(wx.EVT_TOGGLEBUTTON, self.deltrial, self.Delete)
         self.Bind(wx.EVT_BUTTON, self.jumptotrial, self.GotoButton)
@@ -485,6 +755,8 @@ class ButtonPanel(wx.Panel):
         The keypressed method handles right,left or down key presses by the user and updates the trial number
         :param e: event object containing keypress information
         """
+        if not self.IsEnabled():  # an experiment is being loaded
+            return
         if e.KeyCode == wx.WXK_RIGHT:
             self.nexttrial(e)
         elif e.KeyCode == wx.WXK_LEFT:
@@ -508,8 +780,8 @@ class ButtonPanel(wx.Panel):
         """
         The jumptrial method is bound to the go button.  It updates the output, updates the trial index and
         sets the appropriate mode for the trial if indicated by user. If the gobutton box is left blank,
-        it updates the trial index to the closest unselected or unsure trial. It also resets all buttons
-        to their inital state.
+        it updates the trial index to the closest unselected or unsure trial, only among the flagged trials in the
+        flagged only mode. It also resets all buttons to their inital state.
         :param e: the event parameter is not used.
         """
         self.parent.updateoutput()
@@ -517,22 +789,33 @@ class ButtonPanel(wx.Panel):
         if self.Goto.GetValue():
             self.parent.InfoPanel.update_trial_index(int(self.Goto.GetValue()))
         else:
-            output_data = self.parent.experiment['output']
-            unselected_trials = np.unique(output_data[output_data.accept == 0].trial_no)
-            unsure_trials = np.unique(output_data[output_data.unsure == 1].trial_no)
-            if unselected_trials.size & unsure_trials.size:
-                trial_index = np.min(unselected_trials + unsure_trials)
-            elif unselected_trials.size:
-                trial_index = np.min(unselected_trials)
-            elif unsure_trials.size:
-                trial_index = np.min(unsure_trials)
+            experiment = self.parent.experiment
+            unselected_trials = experiment['trials'][trial_values(experiment, 'accept') == 0]
+            unsure_trials = experiment['trials'][trial_values(experiment, 'unsure') == 1]
+            pending_trials = np.union1d(unselected_trials, unsure_trials)
+            flagged = self.parent.flagged_indices()
+            if flagged is not None:
+                pending_trials = np.intersect1d(pending_trials, experiment['trials'][flagged])
+            if pending_trials.size:
+                trial_index = np.min(pending_trials)
             else:
-                trial_index = output_data.trial_no.max()
+                trial_index = experiment['trials'].max()
 
             self.parent.InfoPanel.update_trial_index(trial_index)
 
         self.reset_buttons()
 
+    def gototrial(self, trial):
+        """
+        The gototrial method updates the output and moves to a trial chosen outside of the button panel, such as in
+        the overview window. It also resets all buttons to their inital state.
+        :param trial: the trial number (NOT INDEX)
+        """
+        self.parent.updateoutput()
+        self.parent.InfoPanel.update_trial_index(trial)
+        self.parent.InfoPanel.set_mode()
+        self.reset_buttons()
+
     def fixp1p2(self, e):
         """
         The fixp1p2 method is bound to the p1-p2 button. It updates the current state of pyselector to change p1-p2
@@ -583,7 +866,7 @@ class ButtonPanel(wx.Panel):
         :param e:
         :return:
         """
-        self.parent.trial_data['Unsure'] = 1
+        self.parent.trial_data['unsure'] = int(self.Unsure.GetValue())
 
     def reset_buttons(self):
         """
@@ -628,6 +911,7 @@ class PopupMenu(wx.MenuBar):
         # filemenu buttons
         loaddata = self.filemenu.Append(-1, 'load')
         writedata = self.filemenu.Append(-1, 'save')
+        overview = self.filemenu.Append(-1, 'overview')
         # writedata_cs = filemenu.Append(-1, 'save cs')
 
         self.Append(self.filemenu, 'Files')
@@ -641,6 +925,7 @@ class PopupMenu(wx.MenuBar):
         self.Bind(EVT_MENU, self.outputdata, writedata)
         self.Bind(EVT_MENU, self.getsettingfolder, settingfolder)
         self.Bind(EVT_MENU, self.getdata, loaddata)
+        self.Bind(EVT_MENU, self.showoverview, overview)
         self.savedsettings.Bind(wx.EVT_MENU, self.choosesetting)
 
     def loadsettinggui(self, e):
@@ -682,6 +967,16 @@ class PopupMenu(wx.MenuBar):
         """
         self.parent.MainPanel.outputdata()
 
+    def showoverview(self, e):
+        """
+        the showoverview method is bound to the overview button. It creates and shows an overview window of all the
+        trials of the loaded experiment.
+        :param e: event object instance is not used
+        """
+        if self.parent.MainPanel.ButtonPanel.IsEnabled() and hasattr(self.parent.MainPanel, 'experiment'):
+            win = overviewwindow.OverviewFrame(self.parent, self.parent.MainPanel.experiment)
+            win.Show(True)
+
     def getsettingfolder(self, e):
         """
         The getsettingfolder method creates a folder modal for the user. It updates the global setting folder for
@@ -707,6 +1002,64 @@ class PopupMenu(wx.MenuBar):
             self.savedsettings.Append(-1, item)
 
 
+class LoadThread(threading.Thread):
+    """
+    LoadThread loads an experiment with set_data and scores its trials with score_trials off the UI thread. It reports
+    to the MainPanel with pubsub messages, sent on the UI thread: 'load.progress' while the file is read, 'load.first'
+    when the first trial can be shown, and 'load.done' or 'load.failed' at the end.
+    """
+    def __init__(self, exp_name, setting_locator, setting_name):
+        """
+        The constructor stores what is loaded
+        :param exp_name: String of name of the selected experiment
+        :param setting_locator: String of the setting folder
+        :param setting_name: String of name of the selected settings
+        """
+        super().__init__(daemon=True)
+        self.exp_name = exp_name
+        self.setting_locator = setting_locator
+        self.setting_name = setting_name
+        self.cancelled = threading.Event()
+        self.previewed = False  # set by the MainPanel once the first trial is shown
+
+    def cancel(self):
+        """
+        The cancel method asks the thread to stop loading, which it does at the next chunk of the file
+        """
+        self.cancelled.set()
+
+    def send(self, topic, **kwargs):
+        """
+        The send method sends a pubsub message on the UI thread
+        :param topic: the topic name of the message
+        """
+        wx.CallAfter(pub.sendMessage, topic, loader=self, **kwargs)
+
+    def run(self):
+        """
+        The run method loads the experiment and sends the messages
+        """
+        try:
+            experiment, setting = set_data(self.exp_name, self.setting_locator, self.setting_name,
+                                           progress=lambda fraction: self.send('load.progress', fraction=fraction),
+                                           first_trial=lambda experiment, setting: self.send(
+                                               'load.first', experiment=experiment, setting=setting),
+                                           cancelled=self.cancelled.is_set)
+        except LoadCancelled:
+            logging.info('loading %s cancelled \n', self.exp_name)
+            self.send('load.failed', message=None)
+        except Exception as error:
+            logging.exception('loading %s failed \n', self.exp_name)
+            self.send('load.failed', message=str(error))
+        else:
+            try:
+                experiment['scores'] = score_trials(experiment, setting)
+            except Exception:  # the trials can still be reviewed, only the flagged mode is lost
+                logging.exception('scoring %s failed \n', self.exp_name)
+                experiment['scores'] = None
+            self.send('load.done', experiment=experiment, setting=setting)
+
+
 def run():
     """
     The run method configures the log, and starts the main loop of the app.
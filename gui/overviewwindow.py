@@ -0,0 +1,62 @@
+import wx
+from matplotlib.backends.backend_wxagg import FigureCanvasWxAgg as FigureCanvas
+from matplotlib.figure import Figure
+from pubsub import pub
+
+from database.Plot_Data import OverviewPlot
+
+
+class OverviewFrame(wx.Frame):
+    """
+    The overview frame shows every trial of the loaded experiment at once. Clicking a trial jumps to it in the main
+    window.
+    """
+    def __init__(self, parent, experiment):
+        """
+        The constructor creates the canvas and the overview plot and binds clicks on them
+        :param parent: Myframe
+        :param experiment: Dictionary containing output and grouped trial information for the current experiment
+        """
+        super().__init__(parent=parent, title='Overview', size=(1000, 700))
+
+        # Attributes
+        self.parent = parent
+        self.experiment = experiment
+        self.Canvas = FigureCanvas(self, -1, Figure())
+        self.OverviewPlot = OverviewPlot(self.Canvas.figure, experiment, setting=parent.MainPanel.setting)
+
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(self.Canvas, 1, wx.EXPAND)
+        self.SetSizer(sizer)
+
+        # Actions
+        self.Canvas.mpl_connect('button_press_event', self.onclick)
+        self.Canvas.mpl_connect('pick_event', self.onclick)
+        pub.subscribe(self.ontrialstored, 'trial.stored')
+        self.Bind(wx.EVT_CLOSE, self.OnClose)
+
+    def onclick(self, event):
+        """
+        The onclick method jumps to the trial of a clicked row of the speed image or a picked hand path
+        :param event: matplotlib button_press_event or pick_event
+        """
+        trial = self.OverviewPlot.trial_at(event)
+        if trial is not None and self.parent.MainPanel.ButtonPanel.IsEnabled():
+            self.parent.MainPanel.ButtonPanel.gototrial(trial)
+
+    def ontrialstored(self, experiment, trial):
+        """
+        The ontrialstored method recolours the trials when a decision of the shown experiment is stored
+        :param experiment: the experiment the trial was stored in
+        :param trial: the trial number (NOT INDEX)
+        """
+        if experiment is self.experiment:
+            self.OverviewPlot.update_status(experiment)
+            self.Canvas.draw_idle()
+
+    def OnClose(self, event):
+        """
+        The OnClose method stops listening for stored trials and destroys the frame
+        """
+        pub.unsubscribe(self.ontrialstored, 'trial.stored')
+        self.Destroy()
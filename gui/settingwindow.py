@@ -5,6 +5,8 @@ import os
 import wx
 from wx import *
 
+from database.Select_Data import DETECTION, DETECTORS
+
 
 class SettingFrame(wx.Frame):
     """
@@ -72,13 +74,18 @@ class MainSettingPanel(wx.Panel):
         self.settingdata['Filter'] = self.settingpanel.FindWindowById(1000).GetValue()
         self.settingdata['Use_Pixels'] = self.settingpanel.FindWindowById(1001).GetValue()
         self.settingdata['PX_CM_Ratio'] = self.settingpanel.FindWindowById(25).GetValue()
+        self.settingdata['Prefetch Depth'] = self.settingpanel.FindWindowById(26).GetValue()
+        self.settingdata['Compact'] = self.settingpanel.FindWindowById(1003).GetValue()
+        self.settingdata['Memmap'] = self.settingpanel.FindWindowById(1004).GetValue()
 
         if self.settingpanel.FindWindowById(1002).GetValue():
-            self.settingdata['Header'] = self.settingpanel.FindWindowById(1004).GetValue()
+            self.settingdata['Header'] = self.settingpanel.FindWindowById(1010).GetValue()
         else:
             self.settingdata['Header'] = 0
 
         self.settingdata['return_units'] = self.settingpanel.FindWindowById(5000).GetStringSelection()
+        self.settingdata['Detection'] = dict(self.settingdata.get('Detection') or {},
+                                             Method=self.settingpanel.FindWindowById(5001).GetStringSelection())
         self.settingdata['Name'] = self.buttonpanel.expname.GetValue()
 
         output_fname = self.setting_folder + self.settingdata['Name'] + '.json'
@@ -108,11 +115,19 @@ class MainSettingPanel(wx.Panel):
         self.settingpanel.FindWindowById(1000).SetValue(setting['Filter'])
         self.settingpanel.FindWindowById(1001).SetValue(setting['Use_Pixels'])
         self.settingpanel.FindWindowById(25).SetValue(setting['PX_CM_Ratio'])
+        self.settingpanel.FindWindowById(26).SetValue(str(setting.get('Prefetch Depth', '')))
+        self.settingpanel.FindWindowById(1003).SetValue(setting.get('Compact', False))
+        self.settingpanel.FindWindowById(1004).SetValue(setting.get('Memmap', False))
+        self.settingdata['Resampling'] = setting.get('Resampling', {})  # kept as it is, it has no inputs
+        self.settingdata['Scoring'] = setting.get('Scoring', {})  # kept as it is, it has no inputs
 
         if setting['Header']:
-            self.settingpanel.FindWindowById(1004).SetValue(setting['Header'])
+            self.settingpanel.FindWindowById(1010).SetValue(setting['Header'])
 
         self.settingpanel.FindWindowById(5000).SetStringSelection(setting['return_units'])
+        self.settingdata['Detection'] = setting.get('Detection', {})  # only its Method has an input
+        self.settingpanel.FindWindowById(5001).SetStringSelection(
+            self.settingdata['Detection'].get('Method', DETECTION['Method']))
         self.buttonpanel.expname.SetValue(setting['Name'])
 
         self.settinglist.refresh()
@@ -128,7 +143,7 @@ class SettingPanel(wx.Panel):
         super().__init__(parent=parent)
 
         self.textinputs = ['Display Scale', 'Display Origin', 'Real Scale', 'Real Origin', 'Segments']
-        self.checkinputs = ['Butter Filter', 'Use Pixels', 'Define Header']
+        self.checkinputs = ['Butter Filter', 'Use Pixels', 'Define Header', 'Compact Memory', 'Memory Map']
 
         sizer = wx.BoxSizer(wx.VERTICAL)
         sizer.Add(self.textwidgets(), 5, wx.ALIGN_LEFT)
@@ -156,6 +171,7 @@ class SettingPanel(wx.Panel):
                 sizer.AddMany([header, self.xyfields(idx + 1)])
 
         sizer.AddMany([wx.StaticText(self, label='PixelToCM_Ratio'), wx.TextCtrl(self, id=25)])
+        sizer.AddMany([wx.StaticText(self, label='Prefetch Depth'), wx.TextCtrl(self, id=26)])
         return sizer
 
     def checkwidgets(self):
@@ -174,20 +190,23 @@ class SettingPanel(wx.Panel):
             minisizer.AddMany([header, check])
             sizer.Add(minisizer)
 
-        header = wx.TextCtrl(self, id=1004)
+        header = wx.TextCtrl(self, id=1010)
         sizer.Add(header, wx.GROW)
         return sizer
 
     def units(self):
         """
-        The units methods creates a horizontal wx.sizer for selecting 'cm' or 'px'.
+        The units methods creates a horizontal wx.sizer for selecting 'cm' or 'px' and the movement onset detector.
         :return: wx.horizontal sizer is returned.
         """
         sizer = wx.BoxSizer(wx.HORIZONTAL)
         header = wx.StaticText(self, label='Return Units:')
         units = wx.Choice(self, choices=['CM', 'PIX'], id=5000)
+        detector_header = wx.StaticText(self, label='Onset Detector:')
+        detectors = wx.Choice(self, choices=sorted(DETECTORS), id=5001)
+        detectors.SetStringSelection(DETECTION['Method'])
 
-        sizer.AddMany([header, units])
+        sizer.AddMany([header, units, detector_header, detectors])
         return sizer
 
     def xyfields(self, id):
@@ -20,10 +20,12 @@ setup(
     name='PySelector',
     version='1',
     packages=['gui', 'setting', 'database'],
+    py_modules=['Batch'],
+    entry_points={'console_scripts': ['pyselector-batch=Batch:main']},
     url='https://github.com/thartbm/PySelector',
     license='',
     author='Alireza Tajadod',
     author_email='ATajadod94@gmail.com',
     description='Selection Gui for Preprocessing motor-control data',
-    install_requires = ['wxpython','pandas','matplotlib','numpy','scipy', 'pathlib']
+    install_requires = ['wxpython','pandas','matplotlib','numpy','scipy', 'pathlib', 'pypubsub']
 )
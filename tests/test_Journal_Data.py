@@ -0,0 +1,52 @@
+import json
+import os
+import shutil
+
+from database.Journal_Data import append_decisions, decision, journal_path, replay_journal
+from database.Prefetch_Data import profile_trial
+from database.Read_Data import set_data, store_trial, write_output
+from database.Select_Data import mark_selection
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Test_Data',
+                    '1_4__time_model_reachselected')
+SETTING = {'Display Origin': ['', '', ''], 'Display Scale': ['', '', ''], 'Filter': False, 'Header': 0, 'Name': '',
+           'PX_CM_Ratio': '', 'Real Origin': ['', '', ''], 'Real Scale': ['', '', ''], 'Segments': ['', '', ''],
+           'Use_Pixels': '', 'return_units': 'CM'}
+
+
+def load(tmp_path):
+    """
+    The load method loads a copy of the test session with the test setting, as the GUI does
+    """
+    data_address = str(tmp_path / os.path.basename(DATA))
+    if not os.path.isfile(data_address):
+        shutil.copy(DATA, data_address)
+        with open(str(tmp_path / 'test.json'), 'w') as fp:
+            json.dump(SETTING, fp)
+    return set_data(data_address, str(tmp_path), 'test', use_cache=False)
+
+
+def test_replayed_output_equals_live_output(tmp_path):
+    experiment, setting = load(tmp_path)
+    live_address = str(tmp_path / 'live.csv')
+    journal_address = journal_path(live_address)
+
+    # review some trials as the GUI does: accept, move p1 of one of them and mark another as rejected and unsure
+    for idx, trial in enumerate(experiment['trials'][:4]):
+        trial_data, max_position, reach = profile_trial(experiment, setting, trial)
+        if idx == 1:
+            trial_data.selectedp1 = trial_data.time_ms.values[len(trial_data) // 4]
+        trial_data['accept'] = -1 if idx == 2 else 1
+        trial_data['unsure'] = int(idx == 2)
+        mark_selection(trial_data)
+        store_trial(experiment, trial, trial_data)
+        append_decisions(journal_address, [decision(trial, trial_data)])
+    write_output(experiment, live_address)
+
+    recovered, setting = load(tmp_path)
+    assert replay_journal(recovered, journal_address) == 4
+    recovered_address = str(tmp_path / 'recovered.csv')
+    write_output(recovered, recovered_address)
+
+    with open(live_address) as live, open(recovered_address) as replayed:
+        assert live.read() == replayed.read()
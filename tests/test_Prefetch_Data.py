@@ -0,0 +1,12 @@
+from database.Prefetch_Data import PREFETCH_DEPTH, prefetch_depth
+
+
+def test_prefetch_depth():
+    """
+    The prefetch depth is read from the setting and falls back to the default for text that is not a positive number
+    """
+    assert prefetch_depth({'Prefetch Depth': '5'}) == 5
+    assert prefetch_depth({'Prefetch Depth': 2}) == 2
+    for value in ('', 'abc', '2.5', '0', '-1', None):
+        assert prefetch_depth({'Prefetch Depth': value}) == PREFETCH_DEPTH
+    assert prefetch_depth({}) == PREFETCH_DEPTH